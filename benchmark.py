@@ -0,0 +1,244 @@
+"""Нагрузочный тест бота без Telegram и без реального API.
+
+Синтетические обновления Telegram передаются напрямую в диспетчер main.dp,
+запросы бота к Telegram подменяются, API CampBotControl имитируется mock_api.MockApi.
+Пример запуска:
+
+    python benchmark.py --users 200 --latency 0.01 --error-rate 0.01 --json report.json
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from aiogram import Bot, Dispatcher, types
+from aiogram.bot.base import BaseBot
+
+ADMIN_ID = 1
+FIRST_USER_ID = 1000
+# начало ответов бота об ошибке обработки
+ERROR_REPLIES = ('Произошла ошибка', 'Сервис временно недоступен')
+# начало ответа бота на сообщение, которое не обработал ни один обработчик
+FALLBACK_REPLY = 'Я этого не понимаю'
+# уведомление пользователя, отправляемое после записи активации в API
+ACTIVATED_REPLY = 'Ваша учетная запись активирована'
+ACTIVATION_TIMEOUT = 60
+
+
+def percentile(values, percent):
+    """Функция для расчета перцентиля по отсортированному списку"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+class Harness:
+    """Воспроизведение сценариев пользователей с замером времени обработки каждого обновления"""
+
+    def __init__(self, main, api, telegram_latency=0.0) -> None:
+        self.main = main
+        self.api = api
+        self.telegram_latency = telegram_latency
+        self.update_ids = itertools.count(1)
+        self.latencies = []
+        self.errors = 0
+        self.error_replies = 0
+        self.fallback_replies = 0
+        self.telegram_calls = 0
+        self.activated = collections.defaultdict(asyncio.Event)
+
+    async def fake_request(self, bot, method, data=None, files=None, **kwargs):
+        """Подмена запроса к Bot API: возвращает ответ в формате Telegram без сетевого запроса"""
+        self.telegram_calls += 1
+        if self.telegram_latency:
+            await asyncio.sleep(self.telegram_latency)
+        data = data or {}
+        text = str(data.get('text', ''))
+        if text.startswith(ERROR_REPLIES):
+            self.error_replies += 1
+        elif text.startswith(FALLBACK_REPLY):
+            self.fallback_replies += 1
+        elif text.startswith(ACTIVATED_REPLY):
+            self.activated[int(data['chat_id'])].set()
+        if method.startswith(('send', 'edit')):
+            return {'message_id': next(self.update_ids), 'date': int(time.time()), 'text': data.get('text', ''),
+                    'chat': {'id': int(data.get('chat_id') or 0), 'type': 'private'}}
+        return True
+
+    def update(self, user_id, text):
+        update_id = next(self.update_ids)
+        return types.Update(**{
+            'update_id': update_id,
+            'message': {'message_id': update_id, 'date': int(time.time()), 'text': text,
+                        'chat': {'id': user_id, 'type': 'private'},
+                        'from': {'id': user_id, 'is_bot': False, 'first_name': 'Тест'}},
+        })
+
+    async def send(self, user_id, text):
+        start = time.perf_counter()
+        try:
+            # каждое обновление обрабатывается в своей задаче, как при polling и webhook:
+            # фильтр состояния aiogram кэширует состояние FSM в контексте задачи
+            await asyncio.create_task(self.main.dp.process_update(self.update(user_id, text)))
+        except Exception:
+            self.errors += 1
+        self.latencies.append(time.perf_counter() - start)
+
+    async def registration(self, user_id):
+        for text in ('/start', '/Зарегистрироваться', 'Иван', 'Иванов', '25', 'М', 'Москва'):
+            await self.send(user_id, text)
+
+    async def activation(self, user_id):
+        for text in ('/admin', '/Активировать', str(user_id), '1'):
+            await self.send(ADMIN_ID, text)
+
+    async def wait_activated(self, user_id):
+        """Функция для ожидания записи активации в API: активация выполняется через
+        очередь записи, пользователь получает уведомление после доставки"""
+        await asyncio.wait_for(self.activated[user_id].wait(), ACTIVATION_TIMEOUT)
+
+    async def browsing(self, user_id, rounds, rng):
+        await self.send(user_id, '/start')
+        for _ in range(rounds):
+            type_pid = rng.choice(list(self.api.types))
+            faculty_pid = rng.choice([pid for parent, pid in self.api.faculties if parent == type_pid])
+            profile_pid = rng.choice([key[2] for key in self.api.profiles if key[:2] == (type_pid, faculty_pid)])
+            type_name = self.api.types[type_pid]
+            faculty_name = self.api.faculties[(type_pid, faculty_pid)]
+            profile_name = self.api.profiles[(type_pid, faculty_pid, profile_pid)]
+            for text in ('/Факультеты', type_name, faculty_name, profile_name, 'Назад', profile_name,
+                         'Главное меню', type_name, faculty_name, profile_name, 'Закончить'):
+                await self.send(user_id, text)
+
+    async def scenario(self, user_id, admin_lock, rounds, rng):
+        """Сценарий одного пользователя: регистрация, активация администратором, просмотр каталога"""
+        await self.registration(user_id)
+        async with admin_lock:
+            # администратор один, его диалог активации не должен перемешиваться
+            await self.activation(user_id)
+        await self.wait_activated(user_id)
+        await self.browsing(user_id, rounds, rng)
+
+
+def configure_environment(args, workdir):
+    """Функция для настройки окружения до импорта main: переменные читаются в config при импорте"""
+    os.environ.update({
+        'URL_API': f'http://127.0.0.1:{args.port}/',
+        'API_TOKEN_TELEGRAM': '123456789:AAbenchmarkbenchmarkbenchmarkbenchmark',
+        'API_TOKEN': 'benchmark',
+        'BOT_MODE': 'polling',
+        'NAVIGATION_MODE': 'reply',
+        'FSM_STORAGE': 'memory',
+        'METRICS_PORT': '0',
+        'CATALOG_SNAPSHOT_PATH': os.path.join(workdir, 'catalog_snapshot.json'),
+        'BROADCAST_DB_PATH': os.path.join(workdir, 'broadcast.sqlite3'),
+        'OUTBOX_DB_PATH': os.path.join(workdir, 'outbox.sqlite3'),
+        'THROTTLE_USER_RATE': '1000000', 'THROTTLE_USER_BURST': '1000000',
+        'THROTTLE_CHAT_RATE': '1000000', 'THROTTLE_CHAT_BURST': '1000000',
+        'SEND_GLOBAL_RATE': '1000000', 'SEND_CHAT_RATE': '1000000', 'SEND_CHAT_BURST': '1000000',
+    })
+
+
+async def run(args):
+    from mock_api import MockApi
+
+    api = MockApi(types_count=args.types, faculties_count=args.faculties, profiles_count=args.profiles,
+                  latency=args.latency, error_rate=args.error_rate, admins=[ADMIN_ID], seed=args.seed,
+                  conditional=not args.no_conditional)
+    await api.start(port=args.port)
+    import main
+
+    harness = Harness(main, api, telegram_latency=args.telegram_latency)
+
+    async def fake_request(bot, method, data=None, files=None, **kwargs):
+        return await harness.fake_request(bot, method, data, files, **kwargs)
+
+    BaseBot.request = fake_request
+    Bot.set_current(main.bot)
+    Dispatcher.set_current(main.dp)
+    await main.on_startup(main.dp)
+    try:
+        api.calls.clear()
+        if args.trace_memory:
+            tracemalloc.start()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        rng = random.Random(args.seed)
+        admin_lock = asyncio.Lock()
+        user_ids = range(FIRST_USER_ID, FIRST_USER_ID + args.users)
+        start = time.perf_counter()
+        await asyncio.gather(*(harness.scenario(user_id, admin_lock, args.rounds, rng) for user_id in user_ids))
+        elapsed = time.perf_counter() - start
+        memory_after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    finally:
+        await main.on_shutdown(main.dp)
+        session = await main.bot.get_session()
+        await session.close()
+        await api.stop()
+
+    latencies = sorted(harness.latencies)
+    updates = len(latencies)
+    report = {
+        'users': args.users,
+        'updates': updates,
+        'seconds': round(elapsed, 3),
+        'updates_per_second': round(updates / elapsed, 1),
+        'latency_ms': {name: round(percentile(latencies, percent) * 1000, 2)
+                       for name, percent in (('p50', 50), ('p95', 95), ('p99', 99))},
+        'backend_calls': api.total_calls,
+        'backend_calls_per_update': round(api.total_calls / updates, 3),
+        'backend_not_modified': api.not_modified,
+        'backend_calls_by_endpoint': {f'{method} {endpoint}': count
+                                      for (method, endpoint), count in sorted(api.calls.items())},
+        'telegram_calls': harness.telegram_calls,
+        'errors': harness.errors,
+        'error_replies': harness.error_replies,
+        'fallback_replies': harness.fallback_replies,
+    }
+    if args.trace_memory:
+        report['memory_per_user_bytes'] = round((memory_after - memory_before) / args.users)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест бота с имитацией API')
+    parser.add_argument('--users', type=int, default=100, help='количество пользователей')
+    parser.add_argument('--rounds', type=int, default=3, help='количество просмотров каталога пользователем')
+    parser.add_argument('--types', type=int, default=3)
+    parser.add_argument('--faculties', type=int, default=5)
+    parser.add_argument('--profiles', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.005, help='средняя задержка API, с')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='доля ответов API 500')
+    parser.add_argument('--telegram-latency', type=float, default=0.0, help='задержка ответа Telegram, с')
+    parser.add_argument('--port', type=int, default=8765, help='порт имитации API')
+    parser.add_argument('--no-conditional', action='store_true', help='имитация API без ETag и 304')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--trace-memory', action='store_true', help='замерить память на пользователя')
+    parser.add_argument('--json', help='файл для сохранения отчета')
+    parser.add_argument('--max-error-ratio', type=float, default=0.1,
+                        help='допустимая доля ошибок и ответов "Я этого не понимаю" на обновление')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(args, workdir)
+        report = asyncio.run(run(args))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    failed = report['errors'] + report['error_replies'] + report['fallback_replies']
+    if failed > report['updates'] * args.max_error_ratio:
+        # сценарий не прошел, замеры относятся к обработчикам ошибок, а не к сценарию
+        raise SystemExit(f'Ошибок и непонятых сообщений {failed} из {report["updates"]} обновлений, '
+                         'результаты недостоверны')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiogram.utils.exceptions import RetryAfter, BotBlocked, ChatNotFound, UserDeactivated, CantInitiateConversation
+
+from config import (BROADCAST_DB_PATH, BROADCAST_WORKERS, BROADCAST_RATE, BROADCAST_PAGE_SIZE,
+                    BROADCAST_MAX_ATTEMPTS)
+from throttling import TokenBuckets
+
+logger = logging.getLogger(__name__)
+
+# пользователи, которым отправить сообщение невозможно, повтор не выполняется
+PERMANENT_ERRORS = (BotBlocked, ChatNotFound, UserDeactivated, CantInitiateConversation)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS broadcasts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    text TEXT NOT NULL,
+    admin_id INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'collecting',
+    next_page INTEGER NOT NULL DEFAULT 1,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS deliveries (
+    broadcast_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    PRIMARY KEY (broadcast_id, user_id)
+);
+"""
+
+
+class BroadcastQueue:
+    """Рассылка сообщений всем активным пользователям.
+    Рассылки и получатели хранятся в sqlite, поэтому после перезапуска
+    незавершенные рассылки продолжаются с места остановки. Список пользователей
+    загружается из API постранично, отправка выполняется несколькими воркерами
+    не быстрее rate сообщений в секунду, при RetryAfter воркер ждет указанное время.
+    """
+
+    def __init__(self, bot, api, path=BROADCAST_DB_PATH, workers=BROADCAST_WORKERS, rate=BROADCAST_RATE,
+                 page_size=BROADCAST_PAGE_SIZE, max_attempts=BROADCAST_MAX_ATTEMPTS) -> None:
+        self.bot = bot
+        self.api = api
+        self.path = path
+        self.workers = workers
+        self.limit = TokenBuckets(rate, rate)
+        self.page_size = page_size
+        self.max_attempts = max_attempts
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+        self.__connection = None
+        self.__tasks = {}
+
+    async def __db(self, func, *args):
+        """Функция для выполнения запроса к sqlite в отдельном потоке"""
+        return await asyncio.get_running_loop().run_in_executor(self.__executor, func, *args)
+
+    def __connect(self):
+        self.__connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.__connection.executescript(SCHEMA)
+
+    def __execute(self, query, params=()):
+        with self.__connection:
+            return self.__connection.execute(query, params).fetchall()
+
+    def __add_recipients(self, broadcast_id, user_ids, next_page, collected):
+        with self.__connection:
+            self.__connection.executemany(
+                'INSERT OR IGNORE INTO deliveries (broadcast_id, user_id) VALUES (?, ?)',
+                [(broadcast_id, user_id) for user_id in user_ids])
+            self.__connection.execute('UPDATE broadcasts SET next_page = ?, status = ? WHERE id = ?',
+                                      (next_page, 'sending' if collected else 'collecting', broadcast_id))
+
+    async def start(self):
+        """Функция для открытия базы и продолжения незавершенных рассылок"""
+        await self.__db(self.__connect)
+        rows = await self.__db(self.__execute, "SELECT id FROM broadcasts WHERE status != 'done'")
+        for (broadcast_id,) in rows:
+            logger.info('Продолжаем рассылку %s', broadcast_id)
+            self.__run_task(broadcast_id)
+
+    async def stop(self):
+        for task in self.__tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.__tasks.values(), return_exceptions=True)
+        self.__tasks.clear()
+        if self.__connection is not None:
+            await self.__db(self.__connection.close)
+            self.__connection = None
+
+    def __run_task(self, broadcast_id):
+        task = asyncio.create_task(self.__run(broadcast_id))
+        self.__tasks[broadcast_id] = task
+        task.add_done_callback(lambda _: self.__tasks.pop(broadcast_id, None))
+
+    async def create(self, text, admin_id):
+        """Функция для создания и запуска рассылки
+        Args:
+            text (str): текст сообщения
+            admin_id (int): id администратора для отчета
+        Returns:
+            int: id рассылки
+        """
+        def insert():
+            with self.__connection:
+                return self.__connection.execute(
+                    'INSERT INTO broadcasts (text, admin_id, created_at) VALUES (?, ?, ?)',
+                    (text, admin_id, time.time())).lastrowid
+
+        broadcast_id = await self.__db(insert)
+        self.__run_task(broadcast_id)
+        return broadcast_id
+
+    async def progress(self):
+        """Функция для получения прогресса незавершенных рассылок
+        Returns:
+            dict: id рассылки:{статус доставки:количество}
+        """
+        rows = await self.__db(self.__execute, (
+            "SELECT d.broadcast_id, d.status, COUNT(*) FROM deliveries d "
+            "JOIN broadcasts b ON b.id = d.broadcast_id WHERE b.status != 'done' "
+            "GROUP BY d.broadcast_id, d.status"))
+        progress = {}
+        for broadcast_id, status, count in rows:
+            progress.setdefault(broadcast_id, {})[status] = count
+        return progress
+
+    async def __collect(self, broadcast_id, page):
+        """Функция для постраничной загрузки активных пользователей в список получателей"""
+        while True:
+            user_ids, has_next = await self.api.get_active_users(page=page, page_size=self.page_size)
+            page += 1
+            await self.__db(self.__add_recipients, broadcast_id, user_ids, page, not has_next)
+            if not has_next:
+                return
+
+    async def __deliver(self, text, user_id):
+        """Функция для отправки сообщения одному пользователю
+        Returns:
+            tuple: статус (sent, failed, pending) и текст ошибки
+        """
+        while True:
+            await self.limit.acquire(None)
+            try:
+                await self.bot.send_message(user_id, text)
+                return 'sent', None
+            except RetryAfter as error:
+                logger.warning('Telegram ограничил отправку, ждем %s с', error.timeout)
+                await asyncio.sleep(error.timeout)
+            except PERMANENT_ERRORS as error:
+                return 'failed', str(error)
+            except Exception as error:
+                logger.warning('Ошибка отправки рассылки пользователю %s: %s', user_id, error)
+                return 'pending', str(error)
+
+    async def __worker(self, broadcast_id, text, queue):
+        while not queue.empty():
+            user_id, attempts = queue.get_nowait()
+            status, error = await self.__deliver(text, user_id)
+            if status == 'pending' and attempts + 1 >= self.max_attempts:
+                status = 'failed'
+            await self.__db(self.__execute,
+                            'UPDATE deliveries SET status = ?, attempts = ?, error = ? '
+                            'WHERE broadcast_id = ? AND user_id = ?',
+                            (status, attempts + 1, error, broadcast_id, user_id))
+
+    async def __run(self, broadcast_id):
+        try:
+            rows = await self.__db(self.__execute, 'SELECT text, admin_id, status, next_page FROM broadcasts '
+                                                   'WHERE id = ?', (broadcast_id,))
+            text, admin_id, status, next_page = rows[0]
+            if status == 'collecting':
+                await self.__collect(broadcast_id, next_page)
+            while True:
+                batch = await self.__db(self.__execute,
+                                        "SELECT user_id, attempts FROM deliveries WHERE broadcast_id = ? "
+                                        "AND status = 'pending' LIMIT ?", (broadcast_id, self.page_size))
+                if not batch:
+                    break
+                queue = asyncio.Queue()
+                for item in batch:
+                    queue.put_nowait(item)
+                await asyncio.gather(*(self.__worker(broadcast_id, text, queue) for _ in range(self.workers)))
+            await self.__db(self.__execute, "UPDATE broadcasts SET status = 'done' WHERE id = ?", (broadcast_id,))
+            counts = dict(await self.__db(self.__execute,
+                                          'SELECT status, COUNT(*) FROM deliveries WHERE broadcast_id = ? '
+                                          'GROUP BY status', (broadcast_id,)))
+            await self.bot.send_message(admin_id, f"Рассылка {broadcast_id} завершена, доставлено: "
+                                                  f"{counts.get('sent', 0)}, ошибок: {counts.get('failed', 0)}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            logger.exception('Рассылка %s прервана, будет продолжена после перезапуска: %s', broadcast_id, error)
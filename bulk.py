@@ -0,0 +1,132 @@
+import asyncio
+import csv
+import io
+import logging
+import re
+
+from config import BULK_CONCURRENCY, API_BULK_UPDATE, NOTIFY_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+def parse_activation_pairs(text):
+    """Функция для разбора строк вида user_id:department
+    (разделитель двоеточие, точка с запятой, запятая или пробел)
+    Args:
+        text (str): текст сообщения или содержимое csv файла
+    Returns:
+        tuple: список пар (user_id, department) и список строк с ошибками
+    """
+    pairs, errors = [], []
+    for row in csv.reader(io.StringIO(re.sub(r'[:;\t ]+', ',', text))):
+        row = [cell.strip() for cell in row if cell.strip()]
+        if not row:
+            continue
+        if len(row) == 2 and all(cell.isdigit() for cell in row):
+            pairs.append((row[0], int(row[1])))
+        elif not pairs and not errors and not row[0].isdigit():
+            # строка заголовка csv файла
+            continue
+        else:
+            errors.append(':'.join(row))
+    return pairs, errors
+
+
+def parse_user_ids(text):
+    """Функция для разбора списка id, разделенных пробелами, запятыми или переносами строк
+    Returns:
+        tuple: список id и список некорректных значений
+    """
+    values = [value for value in re.split(r'[\s,;]+', text) if value]
+    return [value for value in values if value.isdigit()], [value for value in values if not value.isdigit()]
+
+
+async def bulk_update(api, updates, concurrency=BULK_CONCURRENCY, use_bulk_endpoint=API_BULK_UPDATE):
+    """Функция для обновления нескольких пользователей. Если API поддерживает
+    массовое обновление, отправляется один запрос, иначе PATCH запросы выполняются
+    параллельно, не более concurrency одновременно
+    Args:
+        api (WorkerApi): клиент API
+        updates (list): список словарей с ключами (user_id, department, is_active)
+        concurrency (int): количество одновременных запросов
+        use_bulk_endpoint (bool): использовать users/bulk_update/
+    Returns:
+        dict: user_id:результат, True - обновлен, False - не найден, str - текст ошибки
+    """
+    if use_bulk_endpoint:
+        try:
+            return await api.bulk_information_update(updates)
+        except Exception as error:
+            logger.exception(error)
+            return {str(item['user_id']): f'ошибка API: {error}' for item in updates}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def update(item):
+        async with semaphore:
+            try:
+                return await api.information_update(data_update=dict(item))
+            except Exception as error:
+                logger.exception(error)
+                return f'ошибка API: {error}'
+
+    results = await asyncio.gather(*(update(item) for item in updates))
+    return {str(item['user_id']): result for item, result in zip(updates, results)}
+
+
+def format_summary(results, action):
+    """Функция для формирования итогового отчета администратору
+    Args:
+        results (dict): user_id:результат из bulk_update
+        action (str): выполненное действие, например активировано
+    Returns:
+        str: текст отчета
+    """
+    done = [user_id for user_id, result in results.items() if result is True]
+    lines = [f'{action.capitalize()}: {len(done)} из {len(results)}']
+    for user_id, result in results.items():
+        if result is False:
+            lines.append(f'{user_id}: учетная запись не найдена')
+        elif result is not True:
+            lines.append(f'{user_id}: {result}')
+    return '\n'.join(lines)
+
+
+class NotificationQueue:
+    """Очередь уведомлений пользователям, обрабатываемая несколькими воркерами.
+    Скорость отправки ограничивается лимитами бота (ThrottledBot)
+    """
+
+    def __init__(self, bot, workers=NOTIFY_WORKERS) -> None:
+        self.bot = bot
+        self.workers = workers
+        self.queue = asyncio.Queue()
+        self.__tasks = []
+
+    def put(self, chat_id, text, reply_markup=None):
+        self.queue.put_nowait((chat_id, text, reply_markup))
+
+    async def __worker(self):
+        while True:
+            chat_id, text, reply_markup = await self.queue.get()
+            try:
+                await self.bot.send_message(chat_id, text, reply_markup=reply_markup)
+            except Exception as error:
+                logger.warning('Не удалось отправить уведомление %s: %s', chat_id, error)
+            finally:
+                self.queue.task_done()
+
+    async def start(self):
+        if not self.__tasks:
+            self.__tasks = [asyncio.create_task(self.__worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout=10):
+        """Функция для отправки оставшихся уведомлений и остановки воркеров"""
+        if self.__tasks and not self.queue.empty():
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning('Не отправлено уведомлений: %s', self.queue.qsize())
+        for task in self.__tasks:
+            task.cancel()
+        await asyncio.gather(*self.__tasks, return_exceptions=True)
+        self.__tasks = []
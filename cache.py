@@ -0,0 +1,288 @@
+import asyncio
+import functools
+import logging
+import time
+from collections import OrderedDict
+
+import httpx
+
+from config import (CATALOG_CACHE_SIZE, CATALOG_TTL_TYPES, CATALOG_TTL_FACULTIES,
+                    CATALOG_TTL_PROFILES, CATALOG_TTL_DESCRIPTIONS, USER_CACHE_SIZE,
+                    USER_CACHE_TTL, USER_CACHE_NEGATIVE_TTL)
+from exceptions import BackendUnavailable, LoadCancelled, ServerError
+from utils import WorkerApi
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Ограниченный LRU кэш с временем жизни записей.
+    Одновременные промахи по одному ключу объединяются в один запрос (single-flight).
+    """
+
+    def __init__(self, maxsize=1024, ttl=300) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self.__inflight = {}
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        """Проверка наличия актуальной записи без учета в статистике"""
+        item = self._data.get(key)
+        return item is not None and item[0] >= time.monotonic()
+
+    def _ttl_for(self, key, value):
+        """Время жизни записи для ключа и значения, переопределяется наследниками"""
+        return self.ttl
+
+    def get(self, key, default=None):
+        """Функция для получения значения из кэша
+        Args:
+            key: ключ
+            default: значение, если ключа нет или запись устарела
+        Returns:
+            значение из кэша или default
+        """
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def put(self, key, value, ttl=None):
+        """Функция для сохранения значения с вытеснением самых старых записей
+        Args:
+            key: ключ
+            value: значение
+            ttl (float): время жизни записи в секундах, по умолчанию для уровня ключа
+        """
+        ttl = self._ttl_for(key, value) if ttl is None else ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def peek(self, key, default=None):
+        """Функция для получения значения без учета времени жизни и статистики,
+        используется, чтобы отдать устаревшие данные при недоступности API"""
+        item = self._data.get(key)
+        return default if item is None else item[1]
+
+    def pop(self, key, default=None):
+        """Функция для удаления записи из кэша"""
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def invalidate(self, predicate):
+        """Функция для удаления записей, ключи которых удовлетворяют условию
+        Args:
+            predicate (callable): функция от ключа
+        Returns:
+            int: количество удаленных записей
+        """
+        keys = [key for key in self._data if predicate(key)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def clear(self):
+        self._data.clear()
+
+    async def get_or_load(self, key, loader, ttl=None):
+        """Функция для получения значения из кэша либо загрузки его через loader.
+        Если загрузка по ключу уже выполняется, ожидаем ее результат,
+        а если она отменена, загружаем сами
+        Args:
+            key: ключ
+            loader (callable): корутинная функция без аргументов для загрузки значения
+            ttl (float): время жизни записи
+        Returns:
+            значение из кэша или результат loader
+        """
+        while True:
+            item = self._data.get(key)
+            if item is not None and item[0] >= time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            future = self.__inflight.get(key)
+            if future is None:
+                break
+            self.hits += 1
+            try:
+                return await asyncio.shield(future)
+            except LoadCancelled:
+                # загрузка отменена вместе с вызвавшим ее обработчиком, загружаем сами
+                self.hits -= 1
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.__inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.set_exception(LoadCancelled(f'Загрузка {key} отменена'))
+            future.exception()
+            raise
+        except Exception as error:
+            future.set_exception(error)
+            # помечаем исключение полученным, если других ожидающих нет
+            future.exception()
+            raise
+        finally:
+            del self.__inflight[key]
+        self.put(key, value, ttl)
+        future.set_result(value)
+        return value
+
+    def stats(self):
+        """Функция для получения статистики кэша
+        Returns:
+            dict: hits, misses, size, ratio
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._data),
+            'ratio': self.hits / total if total else 0.0,
+        }
+
+
+def catalog_key(type_pid=None, faculty_pid=None, profile_pid=None):
+    """Функция для формирования ключа каталога (type_pid, faculty_pid, profile_pid)
+    (None, None, None) - список типов образования
+    (type, None, None) - список факультетов
+    (type, faculty, None) - список профилей
+    (type, faculty, profile) - описание профиля
+    """
+    return tuple(None if pid is None else int(pid) for pid in (type_pid, faculty_pid, profile_pid))
+
+
+class CatalogCache(TTLCache):
+    """Кэш каталога образования с отдельным временем жизни для каждого уровня"""
+
+    def __init__(self, maxsize=CATALOG_CACHE_SIZE,
+                 ttls=(CATALOG_TTL_TYPES, CATALOG_TTL_FACULTIES, CATALOG_TTL_PROFILES, CATALOG_TTL_DESCRIPTIONS)) -> None:
+        super().__init__(maxsize=maxsize)
+        self.ttls = ttls
+
+    def _ttl_for(self, key, value):
+        return self.ttls[sum(pid is not None for pid in key)]
+
+    def invalidate_subtree(self, type_pid=None, faculty_pid=None, profile_pid=None):
+        """Функция для сброса ветки каталога и списка, в котором она находится
+        Без аргументов сбрасывает весь каталог
+        Args:
+            type_pid (int): id типа образования
+            faculty_pid (int): id факультета
+            profile_pid (int): id профиля
+        Returns:
+            int: количество удаленных записей
+        """
+        prefix = tuple(pid for pid in catalog_key(type_pid, faculty_pid, profile_pid) if pid is not None)
+        if not prefix:
+            count = len(self)
+            self.clear()
+            return count
+        parent = catalog_key(*prefix[:-1])
+        count = self.invalidate(lambda key: key[:len(prefix)] == prefix or key == parent)
+        logger.info('Сброшена ветка каталога %s, удалено записей: %s', prefix, count)
+        return count
+
+
+class UserCache(TTLCache):
+    """Кэш данных пользователей для проверки авторизации.
+    Незарегистрированные пользователи кэшируются на отдельное, более короткое время
+    """
+
+    def __init__(self, maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL, negative_ttl=USER_CACHE_NEGATIVE_TTL) -> None:
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.negative_ttl = negative_ttl
+
+    def _ttl_for(self, key, value):
+        return self.ttl if value.get('is_exist') else self.negative_ttl
+
+
+class CachedWorkerApi(WorkerApi):
+    """Клиент API с кэшированием каталога образования и данных пользователей"""
+
+    def __init__(self, url, catalog_cache=None, user_cache=None, **kwargs) -> None:
+        super().__init__(url, **kwargs)
+        self.catalog_cache = CatalogCache() if catalog_cache is None else catalog_cache
+        self.user_cache = UserCache() if user_cache is None else user_cache
+
+    async def get_client_data(self, user_id):
+        return await self.user_cache.get_or_load(
+            str(user_id), functools.partial(super().get_client_data, user_id))
+
+    async def create_user(self, user_data, idempotency_key=None):
+        try:
+            return await super().create_user(user_data, idempotency_key)
+        finally:
+            self.user_cache.pop(str(user_data['user_id']))
+
+    async def information_update(self, data_update, idempotency_key=None):
+        user_id = data_update.get('user_id')
+        try:
+            return await super().information_update(data_update, idempotency_key)
+        finally:
+            self.user_cache.pop(str(user_id))
+
+    async def bulk_information_update(self, updates):
+        try:
+            return await super().bulk_information_update(updates)
+        finally:
+            for item in updates:
+                self.user_cache.pop(str(item['user_id']))
+
+    async def __catalog(self, key, loader):
+        """Функция для получения узла каталога из кэша, при недоступности API
+        или ошибке сервера отдаем устаревшее значение из кэша, если оно есть
+        Args:
+            key (tuple): ключ каталога
+            loader (callable): корутинная функция загрузки из API
+        Returns:
+            значение узла каталога
+        """
+        try:
+            return await self.catalog_cache.get_or_load(key, loader)
+        except (BackendUnavailable, ServerError, httpx.HTTPError) as error:
+            stale = self.catalog_cache.peek(key)
+            if stale is None:
+                raise
+            logger.warning('API недоступен (%s), отдаем устаревшие данные каталога %s', error, key)
+            return stale
+
+    async def prefetch(self, key, ttl=None):
+        """Функция для упреждающей загрузки узла каталога в кэш, если его там нет
+        Args:
+            key (tuple): ключ каталога, кроме списка типов образования
+            ttl (float): время жизни записи
+        """
+        if key in self.catalog_cache:
+            return
+        pids = [pid for pid in key if pid is not None]
+        loader = {1: super().get_faculties, 2: super().get_profiles, 3: super().get_description}[len(pids)]
+        await self.catalog_cache.get_or_load(key, functools.partial(loader, *pids), ttl)
+
+    async def get_type_education(self):
+        return await self.__catalog(catalog_key(), super().get_type_education)
+
+    async def get_faculties(self, type_pid):
+        return await self.__catalog(catalog_key(type_pid), functools.partial(super().get_faculties, type_pid))
+
+    async def get_profiles(self, type_pid, faculite_pid):
+        return await self.__catalog(
+            catalog_key(type_pid, faculite_pid), functools.partial(super().get_profiles, type_pid, faculite_pid))
+
+    async def get_description(self, type_pid, faculite_pid, profile_pid):
+        return await self.__catalog(
+            catalog_key(type_pid, faculite_pid, profile_pid),
+            functools.partial(super().get_description, type_pid, faculite_pid, profile_pid))
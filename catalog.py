@@ -0,0 +1,287 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+
+from config import CATALOG_CONCURRENCY, CATALOG_REFRESH_INTERVAL, CATALOG_SNAPSHOT_PATH
+from utils import WorkerApi
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogTree:
+    """Неизменяемый снимок дерева каталога
+    types - словарь имя типа образования:id
+    faculties - словарь type_pid:{имя факультета:id}
+    profiles - словарь (type_pid, faculty_pid):{имя профиля:id}
+    descriptions - словарь (type_pid, faculty_pid, profile_pid):описание
+    """
+
+    def __init__(self, types, faculties, profiles, descriptions, loaded_at=None) -> None:
+        self.types = types
+        self.faculties = faculties
+        self.profiles = profiles
+        self.descriptions = descriptions
+        self.loaded_at = time.time() if loaded_at is None else loaded_at
+        self.version = hashlib.sha1(
+            json.dumps(self.to_dict(), sort_keys=True, ensure_ascii=False).encode()
+        ).hexdigest()[:12]
+
+    def to_dict(self):
+        """Функция для преобразования снимка в словарь со строковыми ключами
+        Returns:
+            dict: types, faculties, profiles, descriptions
+        """
+        return {
+            'types': self.types,
+            'faculties': {str(type_pid): items for type_pid, items in self.faculties.items()},
+            'profiles': {':'.join(map(str, key)): items for key, items in self.profiles.items()},
+            'descriptions': {':'.join(map(str, key)): text for key, text in self.descriptions.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data, loaded_at=None):
+        """Функция для восстановления снимка из словаря, полученного to_dict
+        Args:
+            data (dict): словарь types, faculties, profiles, descriptions
+            loaded_at (float): время загрузки снимка из API
+        Returns:
+            CatalogTree: снимок каталога
+        """
+        def parse_key(key):
+            return tuple(int(pid) for pid in key.split(':'))
+
+        def intern_names(items):
+            return {sys.intern(name): pid for name, pid in items.items()}
+
+        return cls(
+            types=intern_names(data['types']),
+            faculties={int(type_pid): intern_names(items) for type_pid, items in data['faculties'].items()},
+            profiles={parse_key(key): intern_names(items) for key, items in data['profiles'].items()},
+            descriptions={parse_key(key): text for key, text in data['descriptions'].items()},
+            loaded_at=loaded_at,
+        )
+
+    def dump(self, path):
+        """Функция для атомарной записи снимка в файл
+        Args:
+            path (str): путь к файлу
+        """
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'version': self.version, 'loaded_at': self.loaded_at, 'catalog': self.to_dict()},
+                      file, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Функция для чтения снимка из файла
+        Args:
+            path (str): путь к файлу
+        Returns:
+            CatalogTree: снимок каталога
+        Raises:
+            ValueError: версия в файле не совпадает с содержимым
+        """
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+        tree = cls.from_dict(data['catalog'], loaded_at=data.get('loaded_at'))
+        if tree.version != data.get('version'):
+            raise ValueError(f'Версия снимка {data.get("version")} не совпадает с содержимым файла')
+        return tree
+
+
+class CatalogSnapshot:
+    """Снимок всего каталога в памяти.
+    Загружается при запуске бота, обновляется в фоне с интервалом refresh_interval,
+    новый снимок подменяет старый целиком. Если API недоступен, продолжаем
+    отдавать последний успешно загруженный снимок. Если в снимке нет нужного узла,
+    запрос уходит в api.
+    Снимок сохраняется в файл path и читается из него при запуске,
+    после чего сверяется с API в фоне.
+    """
+
+    def __init__(self, api, concurrency=CATALOG_CONCURRENCY, refresh_interval=CATALOG_REFRESH_INTERVAL,
+                 path=CATALOG_SNAPSHOT_PATH) -> None:
+        self.api = api
+        self.concurrency = concurrency
+        self.refresh_interval = refresh_interval
+        self.path = path
+        self.tree = None
+        # функции listener(tree), вызываются при смене версии снимка
+        self.listeners = []
+        self.__task = None
+
+    @property
+    def version(self):
+        return None if self.tree is None else self.tree.version
+
+    async def __load(self):
+        """Функция для загрузки всего дерева каталога c ограничением
+        количества одновременных запросов
+        Returns:
+            CatalogTree: новый снимок
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def call(method, *args):
+            # вызываем методы WorkerApi напрямую, минуя кэш клиента
+            async with semaphore:
+                return await method(self.api, *args)
+
+        types = await call(WorkerApi.get_type_education)
+        type_pids = list(types.values())
+        faculty_lists = await asyncio.gather(*(call(WorkerApi.get_faculties, pid) for pid in type_pids))
+        faculties = dict(zip(type_pids, faculty_lists))
+        faculty_keys = [(type_pid, pid) for type_pid, items in faculties.items() for pid in items.values()]
+        profile_lists = await asyncio.gather(*(call(WorkerApi.get_profiles, *key) for key in faculty_keys))
+        profiles = dict(zip(faculty_keys, profile_lists))
+        profile_keys = [key + (pid,) for key, items in profiles.items() for pid in items.values()]
+        texts = await asyncio.gather(*(call(WorkerApi.get_description, *key) for key in profile_keys),
+                                     return_exceptions=True)
+        descriptions = {}
+        for key, text in zip(profile_keys, texts):
+            if isinstance(text, Exception):
+                logger.warning('Не удалось загрузить описание профиля %s: %s', key, text)
+                continue
+            descriptions[key] = text
+        return CatalogTree(types, faculties, profiles, descriptions)
+
+    async def refresh(self):
+        """Функция для загрузки нового снимка и подмены текущего
+        Returns:
+            bool: True если снимок обновлен
+        """
+        try:
+            tree = await self.__load()
+        except Exception as error:
+            logger.exception('Не удалось обновить снимок каталога, используем предыдущий: %s', error)
+            return False
+        changed = tree.version != self.version
+        self.tree = tree
+        if changed:
+            logger.info('Загружен снимок каталога версии %s', tree.version)
+            self.__notify(tree)
+            await self.__save(tree)
+        return True
+
+    def __notify(self, tree):
+        for listener in self.listeners:
+            try:
+                listener(tree)
+            except Exception as error:
+                logger.exception('Ошибка обработки новой версии каталога: %s', error)
+
+    async def __save(self, tree):
+        """Функция для записи снимка в файл в отдельном потоке"""
+        if not self.path:
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, tree.dump, self.path)
+        except OSError as error:
+            logger.exception('Не удалось сохранить снимок каталога в %s: %s', self.path, error)
+
+    def load_file(self):
+        """Функция для чтения сохраненного снимка из файла
+        Returns:
+            bool: True если снимок прочитан
+        """
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            self.tree = CatalogTree.load(self.path)
+        except (OSError, ValueError, KeyError) as error:
+            logger.warning('Не удалось прочитать снимок каталога из %s: %s', self.path, error)
+            return False
+        logger.info('Прочитан снимок каталога версии %s из %s', self.tree.version, self.path)
+        self.__notify(self.tree)
+        return True
+
+    async def __refresh_loop(self, delay):
+        while True:
+            await asyncio.sleep(delay)
+            await self.refresh()
+            delay = self.refresh_interval
+
+    async def start(self):
+        """Функция для первичной загрузки и запуска фонового обновления.
+        Если снимок прочитан из файла, сверка с API выполняется в фоне
+        """
+        if self.__task is not None:
+            return
+        if self.load_file():
+            delay = 0
+        else:
+            await self.refresh()
+            delay = self.refresh_interval
+        self.__task = asyncio.create_task(self.__refresh_loop(delay))
+
+    async def stop(self):
+        """Функция для остановки фонового обновления"""
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+            self.__task = None
+
+    async def resolve(self, name, type_pid=None, faculty_pid=None):
+        """Функция для получения id по тексту кнопки из общего индекса имя:id
+        Args:
+            name (str): текст кнопки
+            type_pid (int): id типа образования, если ищем факультет или профиль
+            faculty_pid (int): id факультета, если ищем профиль
+        Returns:
+            int or None: id выбранного элемента или None, если имя не найдено
+        """
+        if type_pid is None:
+            items = await self.get_type_education()
+        elif faculty_pid is None:
+            items = await self.get_faculties(type_pid)
+        else:
+            items = await self.get_profiles(type_pid, faculty_pid)
+        return items.get(name)
+
+    def contains(self, key):
+        """Функция для проверки, есть ли узел каталога в снимке
+        Args:
+            key (tuple): ключ каталога (type_pid, faculty_pid, profile_pid)
+        """
+        tree = self.tree
+        if tree is None:
+            return False
+        pids = tuple(int(pid) for pid in key if pid is not None)
+        if not pids:
+            return True
+        nodes = (tree.faculties, tree.profiles, tree.descriptions)[len(pids) - 1]
+        return (pids[0] if len(pids) == 1 else pids) in nodes
+
+    async def get_type_education(self):
+        tree = self.tree
+        if tree is not None:
+            return tree.types
+        return await self.api.get_type_education()
+
+    async def get_faculties(self, type_pid):
+        tree = self.tree
+        if tree is not None and int(type_pid) in tree.faculties:
+            return tree.faculties[int(type_pid)]
+        return await self.api.get_faculties(type_pid)
+
+    async def get_profiles(self, type_pid, faculite_pid):
+        key = (int(type_pid), int(faculite_pid))
+        tree = self.tree
+        if tree is not None and key in tree.profiles:
+            return tree.profiles[key]
+        return await self.api.get_profiles(type_pid, faculite_pid)
+
+    async def get_description(self, type_pid, faculite_pid, profile_pid):
+        key = (int(type_pid), int(faculite_pid), int(profile_pid))
+        tree = self.tree
+        if tree is not None and key in tree.descriptions:
+            return tree.descriptions[key]
+        return await self.api.get_description(type_pid, faculite_pid, profile_pid)
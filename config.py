@@ -1,20 +1,99 @@
 import os
 from dotenv import load_dotenv
-import logging
 
 load_dotenv()
 API_TOKEN_TELEGRAM = os.getenv('API_TOKEN_TELEGRAM')
 URL_API = os.getenv('URL_API')
 HEADERS = {'Authorization': os.getenv('API_TOKEN')}
 NAME_BOT = os.getenv('NAME_BOT')
-
-
-def set_logging():
-    logging.basicConfig(
-        level=logging.INFO,
-        filename='my_bot.log',
-        format=(
-            '%(asctime)s [%(levelname)s] | '
-            '(%(filename)s).%(funcName)s:%(lineno)d | %(message)s'
-        ),
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv('WEBHOOK_DRAIN_TIMEOUT', 30))
+WEBAPP_HOST = os.getenv('WEBAPP_HOST', '0.0.0.0')
+WEBAPP_PORT = int(os.getenv('WEBAPP_PORT', 8080))
+API_HTTP2 = os.getenv('API_HTTP2', 'true').lower() == 'true'
+API_MAX_CONNECTIONS = int(os.getenv('API_MAX_CONNECTIONS', 20))
+API_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('API_MAX_KEEPALIVE_CONNECTIONS', 10))
+API_KEEPALIVE_EXPIRY = float(os.getenv('API_KEEPALIVE_EXPIRY', 30))
+API_LOG_BODY_LIMIT = int(os.getenv('API_LOG_BODY_LIMIT', 500))
+API_TIMEOUT = float(os.getenv('API_TIMEOUT', 5))
+# таймауты отдельных endpoint в формате 'descriptions=10,users=3'
+API_TIMEOUTS = {
+    endpoint.strip(): float(timeout)
+    for endpoint, timeout in (
+        item.split('=') for item in os.getenv('API_TIMEOUTS', '').split(',') if item.strip()
     )
+}
+API_RETRIES = int(os.getenv('API_RETRIES', 2))
+API_BACKOFF_BASE = float(os.getenv('API_BACKOFF_BASE', 0.2))
+API_BACKOFF_CAP = float(os.getenv('API_BACKOFF_CAP', 2))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', 30))
+CATALOG_CACHE_SIZE = int(os.getenv('CATALOG_CACHE_SIZE', 2048))
+CATALOG_TTL_TYPES = float(os.getenv('CATALOG_TTL_TYPES', 3600))
+CATALOG_TTL_FACULTIES = float(os.getenv('CATALOG_TTL_FACULTIES', 1800))
+CATALOG_TTL_PROFILES = float(os.getenv('CATALOG_TTL_PROFILES', 900))
+CATALOG_TTL_DESCRIPTIONS = float(os.getenv('CATALOG_TTL_DESCRIPTIONS', 600))
+CATALOG_REFRESH_INTERVAL = float(os.getenv('CATALOG_REFRESH_INTERVAL', 300))
+CATALOG_CONCURRENCY = int(os.getenv('CATALOG_CONCURRENCY', 8))
+CATALOG_SNAPSHOT_PATH = os.getenv('CATALOG_SNAPSHOT_PATH', 'catalog_snapshot.json')
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'memory')
+FSM_REDIS_URL = os.getenv('FSM_REDIS_URL', 'redis://localhost:6379/0')
+FSM_STATE_TTL = int(os.getenv('FSM_STATE_TTL', 86400))
+FSM_FILE_PATH = os.getenv('FSM_FILE_PATH', 'fsm_storage.json')
+KEYBOARD_CACHE_SIZE = int(os.getenv('KEYBOARD_CACHE_SIZE', 512))
+KEYBOARD_COLUMNS = int(os.getenv('KEYBOARD_COLUMNS', 2))
+KEYBOARD_COLUMNS_THRESHOLD = int(os.getenv('KEYBOARD_COLUMNS_THRESHOLD', 8))
+NAVIGATION_MODE = os.getenv('NAVIGATION_MODE', 'reply')
+PREFETCH_CONCURRENCY = int(os.getenv('PREFETCH_CONCURRENCY', 4))
+PREFETCH_LIMIT = int(os.getenv('PREFETCH_LIMIT', 20))
+PREFETCH_TTL = float(os.getenv('PREFETCH_TTL', 60))
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', 64))
+UPDATE_USER_QUEUE = int(os.getenv('UPDATE_USER_QUEUE', 10))
+UPDATE_MAX_PENDING = int(os.getenv('UPDATE_MAX_PENDING', 1000))
+THROTTLE_USER_RATE = float(os.getenv('THROTTLE_USER_RATE', 1))
+THROTTLE_USER_BURST = int(os.getenv('THROTTLE_USER_BURST', 5))
+THROTTLE_CHAT_RATE = float(os.getenv('THROTTLE_CHAT_RATE', 2))
+THROTTLE_CHAT_BURST = int(os.getenv('THROTTLE_CHAT_BURST', 10))
+THROTTLE_IDLE_TIMEOUT = float(os.getenv('THROTTLE_IDLE_TIMEOUT', 300))
+SEND_GLOBAL_RATE = float(os.getenv('SEND_GLOBAL_RATE', 30))
+SEND_CHAT_RATE = float(os.getenv('SEND_CHAT_RATE', 1))
+SEND_CHAT_BURST = int(os.getenv('SEND_CHAT_BURST', 3))
+BULK_CONCURRENCY = int(os.getenv('BULK_CONCURRENCY', 5))
+API_BULK_UPDATE = os.getenv('API_BULK_UPDATE', 'false').lower() == 'true'
+NOTIFY_WORKERS = int(os.getenv('NOTIFY_WORKERS', 4))
+BROADCAST_DB_PATH = os.getenv('BROADCAST_DB_PATH', 'broadcast.sqlite3')
+BROADCAST_WORKERS = int(os.getenv('BROADCAST_WORKERS', 4))
+BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', 20))
+BROADCAST_PAGE_SIZE = int(os.getenv('BROADCAST_PAGE_SIZE', 100))
+BROADCAST_MAX_ATTEMPTS = int(os.getenv('BROADCAST_MAX_ATTEMPTS', 3))
+OUTBOX_DB_PATH = os.getenv('OUTBOX_DB_PATH', 'outbox.sqlite3')
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 50))
+OUTBOX_INTERVAL = float(os.getenv('OUTBOX_INTERVAL', 1))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 10))
+OUTBOX_BACKOFF_BASE = float(os.getenv('OUTBOX_BACKOFF_BASE', 1))
+OUTBOX_BACKOFF_CAP = float(os.getenv('OUTBOX_BACKOFF_CAP', 300))
+SUPERVISOR_WORKERS = int(os.getenv('SUPERVISOR_WORKERS', 2))
+SUPERVISOR_BASE_PORT = int(os.getenv('SUPERVISOR_BASE_PORT', 8081))
+SUPERVISOR_HEALTH_INTERVAL = float(os.getenv('SUPERVISOR_HEALTH_INTERVAL', 5))
+SUPERVISOR_HEALTH_FAILURES = int(os.getenv('SUPERVISOR_HEALTH_FAILURES', 3))
+SUPERVISOR_START_TIMEOUT = float(os.getenv('SUPERVISOR_START_TIMEOUT', 60))
+SUPERVISOR_QUEUE_SIZE = int(os.getenv('SUPERVISOR_QUEUE_SIZE', 1000))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9100))
+SEARCH_LIMIT = int(os.getenv('SEARCH_LIMIT', 10))
+SEARCH_MIN_SCORE = float(os.getenv('SEARCH_MIN_SCORE', 0.4))
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 60))
+USER_CACHE_NEGATIVE_TTL = float(os.getenv('USER_CACHE_NEGATIVE_TTL', 10))
+LOG_FILE = os.getenv('LOG_FILE', 'my_bot.log')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+LOG_STDOUT = os.getenv('LOG_STDOUT', 'false').lower() == 'true'
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN', '')
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', 0.1))
@@ -3,4 +3,16 @@ class SynergyBotExceptions(Exception):
 
 
 class UnexpectedAnswer(SynergyBotExceptions):
-    pass
\ No newline at end of file
+    pass
+
+
+class ServerError(UnexpectedAnswer):
+    pass
+
+
+class BackendUnavailable(SynergyBotExceptions):
+    pass
+
+
+class LoadCancelled(SynergyBotExceptions):
+    pass
@@ -1,7 +1,12 @@
+import json
+
 from utils import create_keyboard
+from cache import TTLCache
+from config import KEYBOARD_CACHE_SIZE, KEYBOARD_COLUMNS, KEYBOARD_COLUMNS_THRESHOLD
 from aiogram import  types
+from aiogram.utils.callback_data import CallbackData
 main_list = ['/Факультеты']
-admin_list = ['/Активировать', '/Деактивировать', '/start']
+admin_list = ['/Активировать', '/Активировать_список', '/Деактивировать', '/Рассылка', '/start']
 mobile_block = ['Главное меню', 'Закончить', 'Назад']
 gender_list = ['М', 'Ж', 'отмена']
 start_button = create_keyboard(['/start'])
@@ -12,4 +17,114 @@ main_button = create_keyboard(main_list)
 admin_button = create_keyboard(admin_list)
 mobile_button = create_keyboard(mobile_block)
 gender_button = create_keyboard(gender_list)
-revome_keyboard = types.ReplyKeyboardRemove()
\ No newline at end of file
+revome_keyboard = types.ReplyKeyboardRemove()
+
+# путь в каталоге (type, faculty, profile) для inline навигации, 0 - уровень не выбран
+nav_cb = CallbackData('nav', 'type', 'faculty', 'profile')
+NAV_ROOT = (0, 0, 0)
+DEEP_LINK_PREFIX = 'p'
+
+
+def parent_path(path):
+    """Функция для получения пути уровня выше, используется кнопкой Назад
+    Args:
+        path (tuple): путь (type_pid, faculty_pid, profile_pid)
+    Returns:
+        tuple: путь родительского узла, для корня - корень
+    """
+    path = tuple(int(value) for value in path)
+    depth = sum(1 for pid in path if pid)
+    return path[:max(depth - 1, 0)] + (0,) * (3 - max(depth - 1, 0))
+
+
+def child_path(path, pid):
+    """Функция для получения пути дочернего узла с id pid"""
+    path = tuple(int(value) for value in path)
+    depth = sum(1 for pid in path if pid)
+    return path[:depth] + (int(pid),) + (0,) * (2 - depth)
+
+
+def deep_link(path):
+    """Функция для формирования параметра ссылки t.me/<бот>?start=<параметр> на узел каталога"""
+    return '_'.join([DEEP_LINK_PREFIX, *map(str, path)])
+
+
+def parse_deep_link(payload):
+    """Функция для разбора параметра команды /start
+    Returns:
+        tuple: путь (type_pid, faculty_pid, profile_pid) или None, если параметр не ссылка на каталог
+    """
+    prefix, *pids = payload.split('_')
+    if prefix != DEEP_LINK_PREFIX or len(pids) != 3 or not all(pid.isdigit() for pid in pids):
+        return None
+    path = tuple(int(pid) for pid in pids)
+    if any(path[sum(1 for pid in path if pid):]):
+        # выбранные уровни должны идти подряд с начала пути
+        return None
+    return path
+
+
+class KeyboardFactory:
+    """Кэш клавиатур узлов каталога.
+    Клавиатура строится и сериализуется один раз на узел и версию каталога,
+    старые клавиатуры вытесняются по LRU. Длинные списки раскладываются в columns колонок.
+    """
+
+    def __init__(self, maxsize=KEYBOARD_CACHE_SIZE, columns=KEYBOARD_COLUMNS,
+                 columns_threshold=KEYBOARD_COLUMNS_THRESHOLD) -> None:
+        self.cache = TTLCache(maxsize=maxsize, ttl=float('inf'))
+        self.columns = columns
+        self.columns_threshold = columns_threshold
+
+    def get(self, node, version, names, back=False):
+        """Функция для получения сериализованной клавиатуры узла каталога
+        Args:
+            node (tuple): ключ узла каталога (type_pid, faculty_pid, profile_pid)
+            version (str): версия каталога, None если каталог получен не из снимка
+            names (iterable): имена кнопок
+            back (bool): добавить кнопку Назад
+        Returns:
+            str: json клавиатуры, передается в reply_markup без повторной сериализации
+        """
+        names = tuple(names)
+        key = (node, version or names, back)
+        serialized = self.cache.get(key)
+        if serialized is None:
+            row_width = self.columns if len(names) > self.columns_threshold else 1
+            markup = create_keyboard(names, row_width=row_width, back=back)
+            serialized = json.dumps(markup.to_python(), ensure_ascii=False, separators=(',', ':'))
+            self.cache.put(key, serialized)
+        return serialized
+
+    def get_inline(self, path, version, items):
+        """Функция для получения сериализованной inline клавиатуры узла каталога.
+        В callback data кнопок передается полный путь, поэтому обработчикам
+        не нужно состояние пользователя, а одинаковые имена в разных ветках не конфликтуют
+        Args:
+            path (tuple): путь узла (type_pid, faculty_pid, profile_pid)
+            version (str): версия каталога, None если каталог получен не из снимка
+            items (dict): имя:id дочерних узлов, для описания профиля пустой
+        Returns:
+            str: json клавиатуры
+        """
+        path = tuple(int(value) for value in path)
+        items = tuple(items.items())
+        key = ('inline', path, version or items)
+        serialized = self.cache.get(key)
+        if serialized is None:
+            row_width = self.columns if len(items) > self.columns_threshold else 1
+            markup = types.InlineKeyboardMarkup(row_width=row_width)
+            markup.add(*(types.InlineKeyboardButton(name, callback_data=nav_cb.new(*child_path(path, pid)))
+                         for name, pid in items))
+            if path != NAV_ROOT:
+                back = parent_path(path)
+                row = [types.InlineKeyboardButton('Назад', callback_data=nav_cb.new(*back))]
+                if back != NAV_ROOT:
+                    row.append(types.InlineKeyboardButton('Главное меню', callback_data=nav_cb.new(*NAV_ROOT)))
+                markup.row(*row)
+            serialized = json.dumps(markup.to_python(), ensure_ascii=False, separators=(',', ':'))
+            self.cache.put(key, serialized)
+        return serialized
+
+
+catalog_keyboards = KeyboardFactory()
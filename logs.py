@@ -0,0 +1,129 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+from aiogram import types
+
+from config import (LOG_FILE, LOG_LEVEL, LOG_FORMAT, LOG_STDOUT, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_ROTATE_WHEN,
+                    LOG_QUEUE_SIZE, LOG_DEBUG_SAMPLE_RATE)
+
+TEXT_FORMAT = ('%(asctime)s [%(levelname)s] | (%(filename)s).%(funcName)s:%(lineno)d | '
+               'update=%(update_id)s user=%(user_id)s | %(message)s')
+
+
+class UpdateContextFilter(logging.Filter):
+    """Фильтр, добавляющий в запись id обновления и пользователя Telegram,
+    которое обрабатывается в текущей задаче"""
+
+    def filter(self, record):
+        update = types.Update.get_current()
+        user = types.User.get_current()
+        record.update_id = update.update_id if update is not None else None
+        record.user_id = user.id if user is not None else None
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """Фильтр, пропускающий только долю rate записей уровня DEBUG,
+    записи уровня INFO и выше пропускаются всегда"""
+
+    def __init__(self, rate=LOG_DEBUG_SAMPLE_RATE) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирование записи в одну строку json"""
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'location': f'{record.filename}:{record.funcName}:{record.lineno}',
+            'update_id': getattr(record, 'update_id', None),
+            'user_id': getattr(record, 'user_id', None),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        if record.stack_info:
+            data['stack'] = record.stack_info
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который не блокирует цикл событий: при переполнении
+    очереди запись отбрасывается и учитывается в dropped"""
+
+    def __init__(self, log_queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # сообщение и traceback форматируются в потоке вызова, пока доступны аргументы,
+        # остальное форматирование выполняется в потоке записи
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def create_file_handler(path=LOG_FILE, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT, when=LOG_ROTATE_WHEN):
+    """Функция для создания обработчика файла с ротацией по времени (если задан when,
+    например midnight) или по размеру max_bytes"""
+    if when:
+        return logging.handlers.TimedRotatingFileHandler(path, when=when, backupCount=backup_count,
+                                                         encoding='utf-8', delay=True)
+    return logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                encoding='utf-8', delay=True)
+
+
+def set_logging(level=LOG_LEVEL, log_format=LOG_FORMAT, stdout=LOG_STDOUT, queue_size=LOG_QUEUE_SIZE):
+    """Функция для настройки логирования через очередь: обработчики вызывают только
+    запись в очередь, форматирование и запись в файл выполняются в отдельном потоке
+    Args:
+        level (str): уровень логирования
+        log_format (str): text или json
+        stdout (bool): дублировать записи в stdout
+        queue_size (int): размер очереди записей
+    Returns:
+        QueueListener: запущенный поток записи, останавливается при выходе из программы
+    """
+    formatter = JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT)
+    handlers = [create_file_handler()]
+    if stdout:
+        handlers.append(logging.StreamHandler(sys.stdout))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    queue_handler = DroppingQueueHandler(queue.Queue(queue_size))
+    queue_handler.addFilter(DebugSampler())
+    queue_handler.addFilter(UpdateContextFilter())
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level)
+    listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -1,28 +1,62 @@
+import asyncio
+import io
 import logging
 import sys
 
-from aiogram import Bot, Dispatcher, executor, types
+from aiogram import executor, types
 from aiogram.contrib.middlewares.logging import LoggingMiddleware
-from aiogram.contrib.fsm_storage.memory import MemoryStorage
 from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.filters import Text
-from config import set_logging, URL_API, API_TOKEN_TELEGRAM, NAME_BOT
-from utils import WorkerApi
+from aiogram.utils.callback_data import CallbackData
+from aiogram.utils.exceptions import MessageNotModified
+from config import URL_API, API_TOKEN_TELEGRAM, NAME_BOT, BOT_MODE, NAVIGATION_MODE, \
+    WEBHOOK_DRAIN_TIMEOUT
+from cache import CachedWorkerApi, catalog_key
+from catalog import CatalogSnapshot
 from keybords import gender_list, start_button, cancel_button, registration_button, main_button, admin_button, \
-    mobile_button, gender_button, revome_keyboard
-
-from states import Registration, Activations, GetMessage
+    mobile_button, gender_button, revome_keyboard, catalog_keyboards, nav_cb, NAV_ROOT, parse_deep_link
+
+from states import Registration, Activations, BulkActivations, Deactivations, Broadcast, GetMessage
+from broadcast import BroadcastQueue
+from search import SearchIndex
+from bulk import parse_activation_pairs, parse_user_ids, bulk_update, format_summary, NotificationQueue
+from exceptions import BackendUnavailable
+from storage import create_storage
+from metrics import BotMetrics
+from logs import set_logging
+from ordering import OrderedDispatcher
+from outbox import Outbox, CREATE_USER, INFORMATION_UPDATE, idempotency_key, outbox_message
+from prefetch import Prefetcher
+from throttling import ThrottledBot, ThrottlingMiddleware
+from webhook import WebhookServer
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-handler = logging.StreamHandler(sys.stdout)
-logger.addHandler(handler)
-bot = Bot(token=API_TOKEN_TELEGRAM)
-storage = MemoryStorage()
-dp = Dispatcher(bot, storage=storage)
+bot = ThrottledBot(token=API_TOKEN_TELEGRAM)
+storage = create_storage()
+dp = OrderedDispatcher(bot, storage=storage)
 dp.middleware.setup(LoggingMiddleware())
-
-sclient = WorkerApi(url=URL_API)
+dp.middleware.setup(ThrottlingMiddleware())
+
+sclient = CachedWorkerApi(url=URL_API)
+catalog = CatalogSnapshot(sclient)
+prefetcher = Prefetcher(catalog)
+search_index = SearchIndex()
+catalog.listeners.append(search_index.update)
+search_cb = CallbackData('search', 'type', 'faculty', 'profile')
+
+notifications = NotificationQueue(bot)
+broadcasts = BroadcastQueue(bot, sclient)
+outbox = Outbox(sclient, notifications.put)
+
+metrics = BotMetrics(storage)
+dp.middleware.setup(metrics.middleware)
+sclient.hooks.append(metrics.observe_api)
+metrics.add_cache('catalog', sclient.catalog_cache)
+metrics.add_cache('users', sclient.user_cache)
+metrics.add_cache('keyboards', catalog_keyboards.cache)
+metrics.add_cache('api_inflight', sclient.inflight)
+metrics.add_cache('api_conditional', sclient.validators)
+metrics.add_outbox(outbox)
 
 
 def check_tokens():
@@ -44,21 +78,60 @@ async def send_error_message(user_id):
                                     'кнопку start', reply_markup=start_button)
 
 
+async def send_unavailable_message(user_id):
+    """Сообщение о временной недоступности API, состояние пользователя сохраняется
+    и действие можно повторить"""
+    await bot.send_message(user_id, 'Сервис временно недоступен, повторите действие через несколько минут')
+
+
+async def render_catalog_node(path, user_id=None):
+    """Функция для получения текста и inline клавиатуры узла каталога
+    Args:
+        path (tuple): путь (type_pid, faculty_pid, profile_pid), 0 - уровень не выбран
+        user_id (int): id пользователя для упреждающей загрузки следующего уровня
+    Returns:
+        tuple: текст сообщения и json клавиатуры
+    """
+    type_pid, faculty_pid, profile_pid = path
+    if profile_pid:
+        text, items = await catalog.get_description(type_pid, faculty_pid, profile_pid), {}
+    elif faculty_pid:
+        text, items = 'Выберите направление', await catalog.get_profiles(type_pid, faculty_pid)
+    elif type_pid:
+        text, items = 'Выберите факультет', await catalog.get_faculties(type_pid)
+    else:
+        text, items = 'Выберите тип образования', await catalog.get_type_education()
+    if user_id is not None:
+        prefetcher.schedule(user_id, path, items.values())
+    return text, catalog_keyboards.get_inline(path, catalog.version, items)
+
+
 @dp.message_handler(commands=['start'])
 async def welcome(message: types.Message):
     """Функция для обработки команды start c проверкой
     существования пользователя в системе и активацией учетной
     записи """
     try:
-        user_data = sclient.get_client_data(message.from_user.id)
-        if not user_data.get('is_exist'):
+        user_data = await sclient.get_client_data(message.from_user.id)
+        if not user_data.get('is_exist') and str(message.from_user.id) in outbox.pending_registrations:
+            await message.answer(f'Ваша регистрация обрабатывается, Ваш ID {message.from_user.id}, сообщите БТ.',
+                                 reply_markup=start_button)
+        elif not user_data.get('is_exist'):
             await message.answer('Вы не зарегистрированы, необходимо выполнить регистрацию',
                                  reply_markup=registration_button)
         elif user_data.get('is_exist') and not user_data.get('is_active'):
             await message.answer(f'Ваша учетная запись ожидает активации, Ваш ID {message.from_user.id}, сообщите БТ.',
                                  reply_markup=start_button)
         else:
+            path = parse_deep_link(message.get_args())
+            if path is not None:
+                text, markup = await render_catalog_node(path, message.from_user.id)
+                await message.answer(text, reply_markup=markup)
+                return
             await message.answer(f'Добро пожаловать в информативный бот {NAME_BOT}', reply_markup=main_button)
+    except BackendUnavailable as exc:
+        logger.warning(exc)
+        await send_unavailable_message(message.from_user.id)
     except Exception as exc:
         logger.exception(exc)
         await send_error_message(message.from_user.id)
@@ -71,6 +144,7 @@ async def cancel_handler(message: types.Message, state: FSMContext):
     current_state = await state.get_state()
     if current_state is None:
         return
+    prefetcher.cancel(message.from_user.id)
     await state.finish()
     await message.reply('Вы отменили действие, для повторного запуска нажмите на кнопку',
                         reply_markup=start_button)
@@ -82,8 +156,8 @@ async def cmd_start(message: types.Message):
     в боте с проверкой на существовании в БД
     """
     try:
-        user_data = sclient.get_client_data(message.from_user.id)
-        if not user_data.get('is_exist'):
+        user_data = await sclient.get_client_data(message.from_user.id)
+        if not user_data.get('is_exist') and str(message.from_user.id) not in outbox.pending_registrations:
             await Registration.f_name.set()
             await message.answer(
                 'На любом этапе регистрации вы можете от нее отказаться, написал мне отмена либо нажав '
@@ -146,17 +220,19 @@ async def getting_city(message: types.Message, state: FSMContext):
 
 @dp.message_handler(state=Registration.city)
 async def registration(message: types.Message, state: FSMContext):
-    """Функция для регистрации пользователя в БД"""
+    """Функция для регистрации пользователя в БД,
+    данные сохраняются в очередь записи и отправляются в API в фоне"""
     try:
         async with state.proxy() as data:
             data['city'] = message.text
             data['user_id'] = message.from_user.id
-            await message.reply('Регистрируемся, ожидайте')
-            sclient.create_user(user_data=data.as_dict())
-            await message.answer('Ваша учетная запись ожидает активации,'
-                                 f'Ваш ID {message.from_user.id}, сообщите его БТ'
-                                 )
-            await state.finish()
+            await outbox.put(CREATE_USER, data.as_dict(), idempotency_key(CREATE_USER, message), on_failure=[
+                outbox_message(message.from_user.id, 'Не удалось завершить регистрацию, пройдите ее повторно',
+                               registration_button)])
+        await state.finish()
+        await message.answer('Ваша учетная запись ожидает активации,'
+                             f'Ваш ID {message.from_user.id}, сообщите его БТ'
+                             )
     except Exception as exc:
         logger.exception(exc)
         await send_error_message(message.from_user.id)
@@ -167,7 +243,7 @@ async def registration(message: types.Message, state: FSMContext):
 async def admin(message: types.Message):
     """Функция для проверки разрешений в административное меню"""
     try:
-        user_data = sclient.get_client_data(message.from_user.id)
+        user_data = await sclient.get_client_data(message.from_user.id)
         if not user_data.get('is_exist'):
             await message.answer('Вы не зарегистированы, необходимо выполнить регистрацию',
                                  reply_markup=registration_button)
@@ -186,7 +262,7 @@ async def admin(message: types.Message):
 async def select_action(message: types.Message):
     """Функция для выбора действия в административном меню"""
     try:
-        user_data = sclient.get_client_data(message.from_user.id)
+        user_data = await sclient.get_client_data(message.from_user.id)
         if user_data.get('admin'):
             await Activations.user_id.set()
             await message.answer('Укажите id пользователя',
@@ -196,6 +272,188 @@ async def select_action(message: types.Message):
         await send_error_message(message.from_user.id)
 
 
+@dp.message_handler(commands=['Активировать_список'])
+async def select_bulk_activation(message: types.Message):
+    """Функция для перехода к массовой активации пользователей"""
+    try:
+        user_data = await sclient.get_client_data(message.from_user.id)
+        if user_data.get('admin'):
+            await BulkActivations.payload.set()
+            await message.answer('Отправьте список в формате user_id:отдел, каждый пользователь с новой строки, '
+                                 'либо csv файл с колонками user_id и отдел', reply_markup=cancel_button)
+    except Exception as exc:
+        logger.exception(exc)
+        await send_error_message(message.from_user.id)
+
+
+@dp.message_handler(state=BulkActivations.payload, content_types=['text', 'document'])
+async def bulk_activate_users(message: types.Message, state: FSMContext):
+    """Функция для массовой активации пользователей из списка или csv файла
+    в состоянии BulkActivations.payload с отчетом администратору
+    """
+    try:
+        if message.document:
+            buffer = io.BytesIO()
+            await message.document.download(destination_file=buffer)
+            text = buffer.getvalue().decode('utf-8-sig')
+        else:
+            text = message.text
+        pairs, errors = parse_activation_pairs(text)
+        if not pairs:
+            await message.answer('Не найдено ни одной строки user_id:отдел, повторите или нажмите отмена',
+                                 reply_markup=cancel_button)
+            return
+        await state.finish()
+        await message.answer(f'Активируем учетных записей: {len(pairs)}, ожидайте')
+        results = await bulk_update(sclient, [{'user_id': user_id, 'department': department, 'is_active': True}
+                                              for user_id, department in pairs])
+        for user_id, result in results.items():
+            if result is True:
+                notifications.put(user_id, 'Ваша учетная запись активирована, нажмите на кнопку /start',
+                                  reply_markup=start_button)
+        summary = format_summary(results, 'активировано')
+        if errors:
+            summary += '\nНе распознаны строки: ' + ', '.join(errors)
+        await message.answer(summary, reply_markup=admin_button)
+    except Exception as exc:
+        logger.exception(exc)
+        await send_error_message(message.from_user.id)
+        await state.finish()
+
+
+@dp.message_handler(commands=['Деактивировать'])
+async def select_deactivation(message: types.Message):
+    """Функция для перехода к деактивации пользователей"""
+    try:
+        user_data = await sclient.get_client_data(message.from_user.id)
+        if user_data.get('admin'):
+            await Deactivations.user_ids.set()
+            await message.answer('Укажите id пользователей через пробел или с новой строки',
+                                 reply_markup=cancel_button)
+    except Exception as exc:
+        logger.exception(exc)
+        await send_error_message(message.from_user.id)
+
+
+@dp.message_handler(state=Deactivations.user_ids)
+async def deactivate_users(message: types.Message, state: FSMContext):
+    """Функция для деактивации пользователей в состоянии Deactivations.user_ids
+    с отчетом администратору
+    """
+    try:
+        user_ids, errors = parse_user_ids(message.text)
+        if not user_ids:
+            await message.answer('Не найдено ни одного id, повторите или нажмите отмена', reply_markup=cancel_button)
+            return
+        await state.finish()
+        results = await bulk_update(sclient, [{'user_id': user_id, 'is_active': False} for user_id in user_ids])
+        for user_id, result in results.items():
+            if result is True:
+                notifications.put(user_id, 'Ваша учетная запись деактивирована', reply_markup=start_button)
+        summary = format_summary(results, 'деактивировано')
+        if errors:
+            summary += '\nНекорректные id: ' + ', '.join(errors)
+        await message.answer(summary, reply_markup=admin_button)
+    except Exception as exc:
+        logger.exception(exc)
+        await send_error_message(message.from_user.id)
+        await state.finish()
+
+
+@dp.message_handler(commands=['Рассылка'])
+async def select_broadcast(message: types.Message):
+    """Функция для перехода к рассылке сообщения всем активным пользователям"""
+    try:
+        user_data = await sclient.get_client_data(message.from_user.id)
+        if user_data.get('admin'):
+            await Broadcast.text.set()
+            await message.answer('Отправьте текст сообщения для всех активных пользователей',
+                                 reply_markup=cancel_button)
+    except Exception as exc:
+        logger.exception(exc)
+        await send_error_message(message.from_user.id)
+
+
+@dp.message_handler(state=Broadcast.text)
+async def start_broadcast(message: types.Message, state: FSMContext):
+    """Функция для запуска рассылки в состоянии Broadcast.text"""
+    try:
+        await state.finish()
+        broadcast_id = await broadcasts.create(message.text, message.from_user.id)
+        await message.answer(f'Рассылка {broadcast_id} запущена, по завершении придет отчет, '
+                             'прогресс доступен по команде /Статус', reply_markup=admin_button)
+    except Exception as exc:
+        logger.exception(exc)
+        await send_error_message(message.from_user.id)
+
+
+@dp.message_handler(commands=['Сбросить_кэш'])
+async def reset_catalog_cache(message: types.Message):
+    """Функция для сброса кэша и обновления снимка каталога после изменений в CampBotControl
+    аргументы команды: id типа образования, факультета и профиля через пробел,
+    без аргументов сбрасывается весь каталог
+    """
+    try:
+        user_data = await sclient.get_client_data(message.from_user.id)
+        if not user_data.get('admin'):
+            return
+        pids = message.get_args().split()[:3]
+        if not all(pid.isdigit() for pid in pids):
+            await message.answer('Укажите id через пробел, например /Сбросить_кэш 1 2')
+            return
+        count = sclient.catalog_cache.invalidate_subtree(*pids)
+        refreshed = await catalog.refresh()
+        stats = sclient.catalog_cache.stats()
+        snapshot = 'обновлен' if refreshed else 'не обновлен, используется предыдущий'
+        await message.answer(f"Удалено записей кэша: {count}\n"
+                             f"Попаданий: {stats['hits']}, промахов: {stats['misses']}\n"
+                             f"Снимок каталога {snapshot}, версия {catalog.version}",
+                             reply_markup=admin_button)
+    except Exception as exc:
+        logger.exception(exc)
+        await send_error_message(message.from_user.id)
+
+
+@dp.message_handler(commands=['Статус'])
+async def backend_status(message: types.Message):
+    """Функция для вывода администратору состояния API и кэшей"""
+    try:
+        user_data = await sclient.get_client_data(message.from_user.id)
+        if not user_data.get('admin'):
+            return
+        circuit = sclient.breaker.status()
+        catalog_stats = sclient.catalog_cache.stats()
+        lines = [
+            f"API: {circuit['state']}, ошибок подряд: {circuit['failures']}, отклонено: {circuit['rejected']}",
+            f"Каталог: версия {catalog.version}, кэш {catalog_stats['hits']}/{catalog_stats['misses']}",
+        ]
+        inflight = sclient.inflight.stats()
+        lines.append(f"Объединено одинаковых запросов к API: {inflight['hits']} из "
+                     f"{inflight['hits'] + inflight['misses']}")
+        conditional = sclient.validators.stats()
+        lines.append(f"Каталог без изменений (304/то же тело): {conditional['not_modified']}/"
+                     f"{conditional['unchanged']}, разобрано ответов: {conditional['misses']}")
+        if circuit['retry_in'] is not None:
+            lines.append(f"Повторная проверка API через {circuit['retry_in']:.0f} с")
+        for (method, endpoint), timing in sorted(sclient.timing_stats().items()):
+            lines.append(f"API {method} {endpoint}: запросов {timing['count']}, "
+                         f"среднее {timing['total'] / timing['count'] * 1000:.0f} мс, "
+                         f"максимум {timing['max'] * 1000:.0f} мс")
+        updates = dp.stats()
+        lines.append(f"Обновления: в обработке {updates['in_flight']}, пользователей в очереди {updates['users']}, "
+                     f"отброшено {updates['dropped']}")
+        queue = await outbox.stats()
+        lines.append(f"Очередь записи в API: {queue['depth']}, старейшая запись {queue['oldest_age']:.0f} с, "
+                     f"ошибок {queue['failed']}")
+        for broadcast_id, counts in (await broadcasts.progress()).items():
+            lines.append(f"Рассылка {broadcast_id}: отправлено {counts.get('sent', 0)}, "
+                         f"в очереди {counts.get('pending', 0)}, ошибок {counts.get('failed', 0)}")
+        await message.answer('\n'.join(lines), reply_markup=admin_button)
+    except Exception as exc:
+        logger.exception(exc)
+        await send_error_message(message.from_user.id)
+
+
 @dp.message_handler(state=Activations.user_id)
 async def select_user(message: types.Message, state: FSMContext):
     """Функция для получения user_id в состоянии Activations.user_id"""
@@ -210,23 +468,27 @@ async def select_user(message: types.Message, state: FSMContext):
 @dp.message_handler(state=Activations.department)
 async def activate_user(message: types.Message, state: FSMContext):
     """Функция для получения номера отедла в состоянии Activations.department
-    и смены в БД информации у следующих полей department, is_active
+    и смены в БД информации у следующих полей department, is_active,
+    обновление сохраняется в очередь записи, результат приходит отдельным сообщением
     """
     try:
         async with state.proxy() as data:
             data['department'] = int(message.text)
             data['is_active'] = True
-            status = sclient.information_update(data_update=data.as_dict())
-            if status:
-                await bot.send_message(data['user_id'], 'Ваша учетная запись активирована, нажмите на кнопку /start',
-                                       reply_markup=start_button)
-                await message.answer(
-                    f"Учетная запись {data['user_id']} активирована, сообщение отправлено пользователю")
-                await state.finish()
-            else:
-                await bot.send_message(message.from_user.id, 'Учетная запись с данным id не существует, проверьте id',
-                                       reply_markup=admin_button)
-                await state.finish()
+            update = data.as_dict()
+        await outbox.put(INFORMATION_UPDATE, update, idempotency_key(INFORMATION_UPDATE, message), on_success=[
+            outbox_message(update['user_id'], 'Ваша учетная запись активирована, нажмите на кнопку /start',
+                           start_button),
+            outbox_message(message.from_user.id,
+                           f"Учетная запись {update['user_id']} активирована, сообщение отправлено пользователю"),
+        ], on_failure=[
+            outbox_message(message.from_user.id,
+                           f"Учетная запись {update['user_id']} не активирована: не существует, проверьте id",
+                           admin_button),
+        ])
+        await state.finish()
+        await message.answer(f"Активация учетной записи {update['user_id']} принята, результат придет сообщением",
+                             reply_markup=admin_button)
     except ValueError as error:
         logger.exception(error)
         await bot.send_message(message.from_user.id, 'Введите номер отдела в числовом формате или нажмите отмена ',
@@ -252,40 +514,39 @@ async def menu_navigation(message: types.Message, state: FSMContext):
         current_state = await state.get_state()
         if current_state == 'GetMessage:faculty':
             await GetMessage.previous()
-            async with state.proxy() as data:
-                type_traning = sclient.get_type_education()
-                data['data_dict'] = type_traning
-                markup = types.ReplyKeyboardMarkup(resize_keyboard=True, selective=True)
-                [markup.add(values) for values, pid in type_traning.items()]
+            type_traning = await catalog.get_type_education()
+            prefetcher.schedule(message.from_user.id, catalog_key(), type_traning.values())
+            markup = catalog_keyboards.get(catalog_key(), catalog.version, type_traning)
             await message.answer("Выберите тип образования используя клавиатуру",
                                  reply_markup=markup)
         elif current_state == 'GetMessage:profile':
             await GetMessage.previous()
-            async with state.proxy() as data:
-                faculty_list = sclient.get_faculties(data['type_traning'])
-                markup = types.ReplyKeyboardMarkup(resize_keyboard=True, selective=True)
-                data['data_dict'] = faculty_list
-                [markup.add(values) for values, pid in faculty_list.items()]
-                markup.add('Назад')
-                await message.answer("Выберите  факультет, используя клавиатуру", reply_markup=markup)
+            data = await state.get_data()
+            faculty_list = await catalog.get_faculties(data['type_traning'])
+            prefetcher.schedule(message.from_user.id, catalog_key(data['type_traning']), faculty_list.values())
+            markup = catalog_keyboards.get(catalog_key(data['type_traning']),
+                                           catalog.version, faculty_list, back=True)
+            await message.answer("Выберите  факультет, используя клавиатуру", reply_markup=markup)
         elif current_state == 'GetMessage:last_state' and message.text == 'Назад':
             await GetMessage.previous()
-            async with state.proxy() as data:
-                profiles = sclient.get_profiles(data['type_traning'], data['faculty'])
-                data['data_dict'] = profiles
-                markup = types.ReplyKeyboardMarkup(resize_keyboard=True, selective=True)
-                [markup.add(values) for values, pid in profiles.items()]
-                markup.add('Назад')
-                await message.answer("Выберите  направление, используя клавиатуру", reply_markup=markup)
+            data = await state.get_data()
+            profiles = await catalog.get_profiles(data['type_traning'], data['faculty'])
+            prefetcher.schedule(message.from_user.id, catalog_key(data['type_traning'], data['faculty']),
+                                profiles.values())
+            markup = catalog_keyboards.get(catalog_key(data['type_traning'], data['faculty']),
+                                           catalog.version, profiles, back=True)
+            await message.answer("Выберите  направление, используя клавиатуру", reply_markup=markup)
         elif current_state == 'GetMessage:last_state' and message.text == 'Главное меню':
             await GetMessage.first()
-            async with state.proxy() as data:
-                type_traning = sclient.get_type_education()
-                data['data_dict'] = type_traning
-                markup = types.ReplyKeyboardMarkup(resize_keyboard=True, selective=True)
-                [markup.add(values) for values, pid in type_traning.items()]
+            type_traning = await catalog.get_type_education()
+            prefetcher.schedule(message.from_user.id, catalog_key(), type_traning.values())
+            markup = catalog_keyboards.get(catalog_key(), catalog.version, type_traning)
             await message.answer("Выберите тип образования используя клавиатуру",
                                  reply_markup=markup)
+        await state.update_data(catalog_version=catalog.version)
+    except BackendUnavailable as exc:
+        logger.warning(exc)
+        await send_unavailable_message(message.from_user.id)
     except Exception as exc:
         logger.exception(exc)
         await send_error_message(message.from_user.id)
@@ -296,13 +557,16 @@ async def menu_navigation(message: types.Message, state: FSMContext):
 async def getting_type_trainings(message: types.Message, state: FSMContext):
     """Функция для получения списка направлений для активированных пользователей"""
     try:
-        user_data = sclient.get_client_data(message.from_user.id)
-        if user_data.get('is_active'):
-            async with state.proxy() as data:
-                type_traning = sclient.get_type_education()
-                data['data_dict'] = type_traning
-                markup = types.ReplyKeyboardMarkup(resize_keyboard=True, selective=True)
-                [markup.add(values) for values, pid in type_traning.items()]
+        user_data = await sclient.get_client_data(message.from_user.id)
+        if user_data.get('is_active') and NAVIGATION_MODE == 'inline':
+            await state.finish()
+            text, markup = await render_catalog_node(NAV_ROOT, message.from_user.id)
+            await message.answer(text, reply_markup=markup)
+        elif user_data.get('is_active'):
+            type_traning = await catalog.get_type_education()
+            prefetcher.schedule(message.from_user.id, catalog_key(), type_traning.values())
+            await state.set_data({'catalog_version': catalog.version})
+            markup = catalog_keyboards.get(catalog_key(), catalog.version, type_traning)
             await message.answer("Выберите тип образования используя клавиатуру",
                                  reply_markup=markup)
             await GetMessage.type_traning.set()
@@ -312,25 +576,54 @@ async def getting_type_trainings(message: types.Message, state: FSMContext):
         else:
             await message.answer(f"Ваша учетная запись ожидает активации,Ваш ID {message.from_user.id}, сообщите БТ.",
                                  reply_markup=start_button)
+    except BackendUnavailable as exc:
+        logger.warning(exc)
+        await send_unavailable_message(message.from_user.id)
     except Exception as exc:
         logger.exception(exc)
         await send_error_message(message.from_user.id)
         await state.finish()
 
 
+async def repeat_catalog_choice(message, state, node, items, back=True):
+    """Функция для повторного запроса выбора, если текст не совпал ни с одной кнопкой:
+    пользователь ввел текст вручную или клавиатура устарела после обновления справочника
+    Args:
+        message (types.Message): сообщение пользователя
+        state (FSMContext): состояние пользователя с версией показанной клавиатуры
+        node (tuple): ключ текущего узла каталога
+        items (dict): варианты текущего узла в формате имя:id
+        back (bool): добавить кнопку Назад
+    """
+    data = await state.get_data()
+    if data.get('catalog_version') != catalog.version:
+        text = 'Справочник обновлен, выберите вариант на новой клавиатуре'
+    else:
+        text = 'Такого варианта нет, выберите вариант кнопкой на клавиатуре'
+    await state.update_data(catalog_version=catalog.version)
+    await message.answer(text, reply_markup=catalog_keyboards.get(node, catalog.version, items, back=back))
+
+
 @dp.message_handler(state=GetMessage.type_traning)
 async def getting_faculties(message: types.Message, state: FSMContext):
     """Функция для получения списка факультетов"""
     try:
+        type_traning = await catalog.resolve(message.text)
+        if type_traning is None:
+            await repeat_catalog_choice(message, state, catalog_key(), await catalog.get_type_education(), back=False)
+            return
         async with state.proxy() as data:
-            data['type_traning'] = data['data_dict'].get(message.text)
-            faculty_list = sclient.get_faculties(data['type_traning'])
-            markup = types.ReplyKeyboardMarkup(resize_keyboard=True, selective=True)
-            data['data_dict'] = faculty_list
-            [markup.add(values) for values, pid in faculty_list.items()]
-            markup.add('Назад')
+            data['type_traning'] = type_traning
+            data['catalog_version'] = catalog.version
+            faculty_list = await catalog.get_faculties(data['type_traning'])
+            prefetcher.schedule(message.from_user.id, catalog_key(data['type_traning']), faculty_list.values())
+            markup = catalog_keyboards.get(catalog_key(data['type_traning']),
+                                           catalog.version, faculty_list, back=True)
         await message.answer("Выберите  факультет, используя клавиатуру", reply_markup=markup)
         await GetMessage.next()
+    except BackendUnavailable as exc:
+        logger.warning(exc)
+        await send_unavailable_message(message.from_user.id)
     except Exception as exc:
         logger.exception(exc)
         await send_error_message(message.from_user.id)
@@ -341,15 +634,25 @@ async def getting_faculties(message: types.Message, state: FSMContext):
 async def getting_profiles(message: types.Message, state: FSMContext):
     """Функция для получения списка профилей"""
     try:
+        data = await state.get_data()
+        faculty = await catalog.resolve(message.text, data['type_traning'])
+        if faculty is None:
+            await repeat_catalog_choice(message, state, catalog_key(data['type_traning']),
+                                        await catalog.get_faculties(data['type_traning']))
+            return
         async with state.proxy() as data:
-            data['faculty'] = data['data_dict'].get(message.text)
-            profiles = sclient.get_profiles(int(data['type_traning']), int(data['faculty']))
-            data['data_dict'] = profiles
-            markup = types.ReplyKeyboardMarkup(resize_keyboard=True, selective=True)
-            [markup.add(values) for values, pid in profiles.items()]
-            markup.add('Назад')
+            data['faculty'] = faculty
+            data['catalog_version'] = catalog.version
+            profiles = await catalog.get_profiles(int(data['type_traning']), int(data['faculty']))
+            prefetcher.schedule(message.from_user.id, catalog_key(data['type_traning'], data['faculty']),
+                                profiles.values())
+            markup = catalog_keyboards.get(catalog_key(data['type_traning'], data['faculty']),
+                                           catalog.version, profiles, back=True)
         await message.answer("Выберите направление, используя клавиатуру", reply_markup=markup)
         await GetMessage.next()
+    except BackendUnavailable as exc:
+        logger.warning(exc)
+        await send_unavailable_message(message.from_user.id)
     except Exception as exc:
         logger.exception(exc)
         await send_error_message(message.from_user.id)
@@ -362,23 +665,58 @@ async def getting_message(message: types.Message, state: FSMContext):
     передаем api собранные раннее данные и получаем сообщение
     """
     try:
+        data = await state.get_data()
+        profile = await catalog.resolve(message.text, data['type_traning'], data['faculty'])
+        if profile is None:
+            await repeat_catalog_choice(message, state, catalog_key(data['type_traning'], data['faculty']),
+                                        await catalog.get_profiles(data['type_traning'], data['faculty']))
+            return
         async with state.proxy() as data:
-            data['profile'] = data['data_dict'].get(message.text)
-            description = sclient.get_description(data['type_traning'], data['faculty'], data['profile'])
-            data['data_dict'] = description
+            data['profile'] = profile
+            description = await catalog.get_description(data['type_traning'], data['faculty'], data['profile'])
+        prefetcher.cancel(message.from_user.id)
         await bot.send_message(message.from_user.id, description, reply_markup=mobile_button)
         await GetMessage.next()
+    except BackendUnavailable as exc:
+        logger.warning(exc)
+        await send_unavailable_message(message.from_user.id)
     except Exception as exc:
         logger.exception(exc)
         await send_error_message(message.from_user.id)
         await state.finish()
 
 
+@dp.callback_query_handler(nav_cb.filter(), state='*')
+async def inline_navigation(call: types.CallbackQuery, callback_data: dict):
+    """Функция для inline навигации по каталогу без состояния пользователя:
+    путь узла передается в callback data, сообщение редактируется на месте
+    """
+    try:
+        user_data = await sclient.get_client_data(call.from_user.id)
+        if not user_data.get('is_active'):
+            await call.answer('Учетная запись не активирована')
+            return
+        path = tuple(int(callback_data[level]) for level in ('type', 'faculty', 'profile'))
+        text, markup = await render_catalog_node(path, call.from_user.id)
+        try:
+            await call.message.edit_text(text, reply_markup=markup)
+        except MessageNotModified:
+            pass
+        await call.answer()
+    except BackendUnavailable as exc:
+        logger.warning(exc)
+        await call.answer('Сервис временно недоступен, повторите через несколько минут')
+    except Exception as exc:
+        logger.exception(exc)
+        await send_error_message(call.from_user.id)
+
+
 @dp.message_handler(state=GetMessage.last_state)
 async def finish_getting_message(message: types.Message, state: FSMContext):
     """Функция для завершения статуса получения сообщения и выход в главное меню,
     а также возможности воспользоваться кнопкой назад"""
     try:
+        prefetcher.cancel(message.from_user.id)
         await state.finish()
         await bot.send_message(message.from_user.id, f'Добро пожаловать в информативный бот {NAME_BOT}',
                                reply_markup=main_button)
@@ -388,15 +726,112 @@ async def finish_getting_message(message: types.Message, state: FSMContext):
         await state.finish()
 
 
+@dp.message_handler(commands=['поиск'])
+async def search_profiles(message: types.Message):
+    """Функция для поиска профилей по тексту среди названий типов образования,
+    факультетов и профилей, найденные профили отправляются кнопками
+    """
+    try:
+        user_data = await sclient.get_client_data(message.from_user.id)
+        if not user_data.get('is_active'):
+            await message.answer('Поиск доступен после активации учетной записи, нажмите /start',
+                                 reply_markup=start_button)
+            return
+        query = message.get_args()
+        if not query:
+            await message.answer('Укажите текст для поиска, например /поиск финансы')
+            return
+        results = search_index.search(query)
+        if not results:
+            await message.answer('Ничего не найдено, попробуйте изменить запрос')
+            return
+        markup = types.InlineKeyboardMarkup(row_width=1)
+        for (type_pid, faculty_pid, profile_pid), names, score in results:
+            markup.add(types.InlineKeyboardButton(
+                ' / '.join(names), callback_data=search_cb.new(type=type_pid, faculty=faculty_pid, profile=profile_pid)))
+        await message.answer('Выберите профиль', reply_markup=markup)
+    except Exception as exc:
+        logger.exception(exc)
+        await send_error_message(message.from_user.id)
+
+
+@dp.callback_query_handler(search_cb.filter(), state='*')
+async def send_found_description(call: types.CallbackQuery, callback_data: dict):
+    """Функция для отправки описания профиля, выбранного в результатах поиска"""
+    try:
+        user_data = await sclient.get_client_data(call.from_user.id)
+        if not user_data.get('is_active'):
+            await call.answer('Учетная запись не активирована')
+            return
+        description = await catalog.get_description(callback_data['type'], callback_data['faculty'],
+                                                    callback_data['profile'])
+        await bot.send_message(call.from_user.id, description)
+        await call.answer()
+    except Exception as exc:
+        logger.exception(exc)
+        await send_error_message(call.from_user.id)
+
+
+@dp.inline_handler()
+async def inline_search(inline_query: types.InlineQuery):
+    """Функция для поиска профилей в inline режиме, выбранный результат
+    отправляет описание профиля
+    """
+    try:
+        user_data = await sclient.get_client_data(inline_query.from_user.id)
+        if not user_data.get('is_active'):
+            await inline_query.answer([], cache_time=10, is_personal=True,
+                                      switch_pm_text='Учетная запись не активирована', switch_pm_parameter='start')
+            return
+        results = search_index.search(inline_query.query)
+        descriptions = await asyncio.gather(*(catalog.get_description(*path) for path, names, score in results),
+                                            return_exceptions=True)
+        articles = [
+            types.InlineQueryResultArticle(
+                id='_'.join(map(str, path)), title=names[2], description=f'{names[0]} / {names[1]}',
+                input_message_content=types.InputTextMessageContent(description))
+            for (path, names, score), description in zip(results, descriptions)
+            if not isinstance(description, Exception)
+        ]
+        await inline_query.answer(articles, cache_time=60, is_personal=True)
+    except Exception as exc:
+        logger.exception(exc)
+
+
 @dp.message_handler(content_types=['text'])
 async def getting_another_text(message):
     await bot.send_message(message.from_user.id, 'Я этого не понимаю, для перехода в главное меню нажмите на кнопку '
                                                  '/start', reply_markup=start_button)
 
 
+async def on_startup(dispatcher):
+    """Открываем пул соединений к API и загружаем снимок каталога при запуске бота"""
+    await sclient.open()
+    await catalog.start()
+    await notifications.start()
+    await broadcasts.start()
+    await outbox.start()
+    await metrics.start()
+
+
+async def on_shutdown(dispatcher):
+    """Останавливаем обновление каталога и закрываем пул соединений к API при остановке бота"""
+    await dispatcher.drain(WEBHOOK_DRAIN_TIMEOUT)
+    await metrics.stop()
+    await prefetcher.stop()
+    await notifications.stop()
+    await broadcasts.stop()
+    await outbox.stop()
+    await catalog.stop()
+    await sclient.close()
+
+
 def main():
     try:
-        executor.start_polling(dp, skip_updates=True)
+        if BOT_MODE == 'webhook':
+            WebhookServer(dp).run(on_startup=on_startup, on_shutdown=on_shutdown)
+        else:
+            executor.start_polling(dp, skip_updates=True, on_startup=on_startup, on_shutdown=on_shutdown)
     except Exception as error:
         logger.exception(error)
 
@@ -0,0 +1,277 @@
+import bisect
+import logging
+import time
+from collections import Counter as StateCounter, defaultdict
+
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from aiogram.dispatcher.handler import current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from aiohttp import web
+
+from config import METRICS_HOST, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(labelnames, values, extra=()):
+    """Функция для формирования блока меток в формате Prometheus"""
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Metric:
+    """Базовый класс метрики с метками"""
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def labels_key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self):
+        """Функция для получения строк значений метрики"""
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.values = defaultdict(float)
+
+    def inc(self, value=1, **labels):
+        self.values[self.labels_key(labels)] += value
+
+    def samples(self):
+        return [f'{self.name}{format_labels(self.labelnames, key)} {value}' for key, value in self.values.items()]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        self.values[self.labels_key(labels)] = value
+
+    def dec(self, value=1, **labels):
+        self.values[self.labels_key(labels)] -= value
+
+    def clear(self):
+        self.values.clear()
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = self.labels_key(labels)
+        series = self.values.get(key)
+        if series is None:
+            series = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self):
+        lines = []
+        for key, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{format_labels(self.labelnames, key, [("le", bound)])} {cumulative}')
+            lines.append(f'{self.name}_sum{format_labels(self.labelnames, key)} {total}')
+            lines.append(f'{self.name}_count{format_labels(self.labelnames, key)} {cumulative}')
+        return lines
+
+
+async def fsm_population(storage):
+    """Функция для подсчета пользователей в каждом состоянии FSM
+    Args:
+        storage (BaseStorage): хранилище состояний
+    Returns:
+        collections.Counter: состояние:количество пользователей
+    """
+    population = StateCounter()
+    if isinstance(storage, MemoryStorage):
+        for chat in storage.data.values():
+            for record in chat.values():
+                if record.get('state'):
+                    population[record['state']] += 1
+    elif hasattr(storage, 'iter_states'):
+        async for state in storage.iter_states():
+            population[state] += 1
+    return population
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Middleware для замера времени обработчиков и количества обновлений в обработке.
+    Должен подключаться после middleware, которые могут отменить обновление
+    """
+
+    def __init__(self, metrics) -> None:
+        super().__init__()
+        self.metrics = metrics
+
+    async def on_pre_process_update(self, update, data):
+        self.metrics.updates_in_flight.inc()
+
+    async def on_post_process_update(self, update, results, data):
+        self.metrics.updates_in_flight.dec()
+
+    @staticmethod
+    def start_handler(data):
+        handler = current_handler.get()
+        data['metrics_handler'] = getattr(handler, '__name__', 'unknown')
+        data['metrics_start'] = time.perf_counter()
+
+    def observe_handler(self, data):
+        if 'metrics_start' in data:
+            self.metrics.handler_seconds.observe(time.perf_counter() - data['metrics_start'],
+                                                 handler=data['metrics_handler'])
+
+    async def on_process_message(self, message, data):
+        self.start_handler(data)
+
+    async def on_post_process_message(self, message, results, data):
+        self.observe_handler(data)
+
+    async def on_process_callback_query(self, callback_query, data):
+        self.start_handler(data)
+
+    async def on_post_process_callback_query(self, callback_query, results, data):
+        self.observe_handler(data)
+
+    async def on_process_inline_query(self, inline_query, data):
+        self.start_handler(data)
+
+    async def on_post_process_inline_query(self, inline_query, results, data):
+        self.observe_handler(data)
+
+
+class BotMetrics:
+    """Метрики бота в формате Prometheus, доступные по GET /metrics
+    handler_seconds - время работы обработчиков
+    api_request_seconds, api_requests_total - время и статусы запросов к API
+    updates_in_flight - обновления в обработке
+    fsm_users - количество пользователей в состояниях FSM
+    cache_* - статистика кэшей
+    outbox_* - очередь записи в API
+    """
+
+    def __init__(self, storage=None, host=METRICS_HOST, port=METRICS_PORT) -> None:
+        self.storage = storage
+        self.host = host
+        self.port = port
+        self.metrics = []
+        self.collectors = []
+        self.caches = {}
+        self.__runner = None
+        self.handler_seconds = self.add(Histogram(
+            'bot_handler_seconds', 'Время работы обработчика', ['handler']))
+        self.api_request_seconds = self.add(Histogram(
+            'bot_api_request_seconds', 'Время запроса к API', ['method', 'endpoint']))
+        self.api_requests_total = self.add(Counter(
+            'bot_api_requests_total', 'Количество запросов к API по статусам', ['method', 'endpoint', 'status']))
+        self.updates_in_flight = self.add(Gauge(
+            'bot_updates_in_flight', 'Количество обновлений в обработке'))
+        self.fsm_users = self.add(Gauge(
+            'bot_fsm_users', 'Количество пользователей в состоянии FSM', ['group', 'state']))
+        self.cache_hits = self.add(Gauge('bot_cache_hits', 'Попадания в кэш', ['cache']))
+        self.cache_misses = self.add(Gauge('bot_cache_misses', 'Промахи кэша', ['cache']))
+        self.cache_hit_ratio = self.add(Gauge('bot_cache_hit_ratio', 'Доля попаданий в кэш', ['cache']))
+        self.cache_size = self.add(Gauge('bot_cache_size', 'Количество записей в кэше', ['cache']))
+        self.outbox_depth = self.add(Gauge('bot_outbox_depth', 'Недоставленные записи в очереди записи в API'))
+        self.outbox_oldest_seconds = self.add(Gauge(
+            'bot_outbox_oldest_seconds', 'Возраст самой старой недоставленной записи'))
+        self.outbox_failed = self.add(Gauge('bot_outbox_failed', 'Записи, не доставленные после всех попыток'))
+        self.outbox = None
+        self.middleware = MetricsMiddleware(self)
+        self.collectors.append(self.collect_fsm)
+        self.collectors.append(self.collect_caches)
+        self.collectors.append(self.collect_outbox)
+
+    def add(self, metric):
+        """Функция для регистрации метрики"""
+        self.metrics.append(metric)
+        return metric
+
+    def add_cache(self, name, cache):
+        """Функция для регистрации кэша с методом stats()"""
+        self.caches[name] = cache
+
+    def add_outbox(self, outbox):
+        """Функция для регистрации очереди записи с методом stats()"""
+        self.outbox = outbox
+
+    def observe_api(self, method, endpoint, status, elapsed):
+        """Hook WorkerApi для учета запросов к API"""
+        self.api_request_seconds.observe(elapsed, method=method, endpoint=endpoint)
+        self.api_requests_total.inc(method=method, endpoint=endpoint, status=status or 'error')
+
+    async def collect_fsm(self):
+        if self.storage is None:
+            return
+        self.fsm_users.clear()
+        for state, count in (await fsm_population(self.storage)).items():
+            self.fsm_users.set(count, group=state.split(':')[0], state=state)
+
+    async def collect_caches(self):
+        for name, cache in self.caches.items():
+            stats = cache.stats()
+            self.cache_hits.set(stats['hits'], cache=name)
+            self.cache_misses.set(stats['misses'], cache=name)
+            self.cache_hit_ratio.set(stats['ratio'], cache=name)
+            self.cache_size.set(stats['size'], cache=name)
+
+    async def collect_outbox(self):
+        if self.outbox is None:
+            return
+        stats = await self.outbox.stats()
+        self.outbox_depth.set(stats['depth'])
+        self.outbox_oldest_seconds.set(stats['oldest_age'])
+        self.outbox_failed.set(stats['failed'])
+
+    async def render(self):
+        """Функция для формирования ответа /metrics"""
+        for collector in self.collectors:
+            try:
+                await collector()
+            except Exception as error:
+                logger.exception('Ошибка сбора метрик: %s', error)
+        return '\n'.join(metric.render() for metric in self.metrics) + '\n'
+
+    async def handle_metrics(self, request):
+        return web.Response(text=await self.render(), content_type='text/plain', charset='utf-8')
+
+    async def start(self):
+        """Функция для запуска http сервера метрик, если задан порт"""
+        if not self.port or self.__runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle_metrics)
+        self.__runner = web.AppRunner(app)
+        await self.__runner.setup()
+        await web.TCPSite(self.__runner, self.host, self.port).start()
+        logger.info('Метрики доступны на http://%s:%s/metrics', self.host, self.port)
+
+    async def stop(self):
+        if self.__runner is not None:
+            await self.__runner.cleanup()
+            self.__runner = None
@@ -0,0 +1,193 @@
+import argparse
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from collections import Counter
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+TRUE_VALUES = ('true', 'True', '1')
+
+
+class MockApi:
+    """Локальная имитация API CampBotControl для нагрузочного тестирования.
+    Поддерживает endpoint users/, type/, faculties/, profiles/ и descriptions/,
+    каталог генерируется по количеству элементов на каждом уровне.
+    Каждый ответ задерживается в среднем на latency секунд (равномерно от 0.5 до 1.5 latency),
+    с вероятностью error_rate вместо ответа возвращается 500.
+    Ответы каталога содержат ETag и Last-Modified, если conditional, на условный запрос
+    с совпадающим валидатором возвращается 304 без тела.
+    """
+
+    def __init__(self, types_count=3, faculties_count=5, profiles_count=8, latency=0.005, error_rate=0.0,
+                 admins=(), seed=None, conditional=True) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self.conditional = conditional
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.not_modified = 0
+        self.last_modified = formatdate(time.time(), usegmt=True)
+        self.users = {user_id: {'user_id': user_id, 'is_active': True, 'admin': True, 'department': 1}
+                      for user_id in admins}
+        self.types = {pid: f'Тип образования {pid}' for pid in range(1, types_count + 1)}
+        self.faculties = {(type_pid, pid): f'Факультет {type_pid}.{pid}'
+                          for type_pid in self.types for pid in range(1, faculties_count + 1)}
+        self.profiles = {(*key, pid): f'Профиль {key[0]}.{key[1]}.{pid}'
+                         for key in self.faculties for pid in range(1, profiles_count + 1)}
+        self.app = web.Application(middlewares=[self.__simulate])
+        self.app.router.add_get('/users/', self.list_users)
+        self.app.router.add_post('/users/', self.create_user)
+        self.app.router.add_post('/users/bulk_update/', self.bulk_update)
+        self.app.router.add_get('/users/{user_id}/', self.get_user)
+        self.app.router.add_patch('/users/{user_id}/', self.update_user)
+        self.app.router.add_get('/type/', self.get_types)
+        self.app.router.add_get('/faculties/{type_pid}/', self.get_faculties)
+        self.app.router.add_get('/profiles/{type_pid}/{faculty_pid}/', self.get_profiles)
+        self.app.router.add_get('/descriptions/{type_pid}/{faculty_pid}/{profile_pid}/', self.get_description)
+        self.__runner = None
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    @web.middleware
+    async def __simulate(self, request, handler):
+        """Middleware для подсчета запросов, задержки ответа и случайных ошибок"""
+        self.calls[(request.method, request.path.strip('/').split('/', 1)[0])] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * self.random.uniform(0.5, 1.5))
+        if self.error_rate and self.random.random() < self.error_rate:
+            return web.Response(status=HTTPStatus.INTERNAL_SERVER_ERROR)
+        return await handler(request)
+
+    def modified_since(self, request):
+        """Функция для проверки If-Modified-Since
+        Returns:
+            bool: каталог изменен после указанной даты или дата не указана
+        """
+        try:
+            since = parsedate_to_datetime(request.headers['If-Modified-Since'])
+        except (KeyError, TypeError, ValueError):
+            return True
+        return parsedate_to_datetime(self.last_modified) > since
+
+    def items(self, request, names):
+        """Функция для формирования ответа каталога с учетом условного запроса"""
+        response = web.json_response([{'id': pid, 'name': name} for pid, name in names.items()])
+        if not self.conditional:
+            return response
+        etag = f'"{hashlib.md5(response.body).hexdigest()}"'
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = self.last_modified
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            not_modified = etag in (tag.strip() for tag in if_none_match.split(',')) or if_none_match.strip() == '*'
+        else:
+            not_modified = not self.modified_since(request)
+        if not_modified:
+            self.not_modified += 1
+            return web.Response(status=HTTPStatus.NOT_MODIFIED,
+                                headers={'ETag': etag, 'Last-Modified': self.last_modified})
+        return response
+
+    async def list_users(self, request):
+        active = [user for user in self.users.values()
+                  if request.query.get('is_active') not in TRUE_VALUES or user['is_active']]
+        page, page_size = int(request.query.get('page', 1)), int(request.query.get('page_size', 100))
+        results = active[(page - 1) * page_size:page * page_size]
+        if page > 1 and not results:
+            return web.Response(status=HTTPStatus.NOT_FOUND)
+        return web.json_response({'results': results, 'next': page * page_size < len(active) or None})
+
+    async def create_user(self, request):
+        data = dict(await request.post())
+        user_id = int(data['user_id'])
+        self.users[user_id] = {**data, 'user_id': user_id, 'is_active': False, 'admin': False}
+        return web.json_response(self.users[user_id], status=HTTPStatus.CREATED)
+
+    async def get_user(self, request):
+        user = self.users.get(int(request.match_info['user_id']))
+        if user is None:
+            return web.json_response({'detail': 'Not found.'}, status=HTTPStatus.NOT_FOUND)
+        return web.json_response(user)
+
+    def __update(self, user_id, data):
+        user = self.users.get(int(user_id))
+        if user is None:
+            return False
+        if 'department' in data:
+            user['department'] = int(data['department'])
+        if 'is_active' in data:
+            user['is_active'] = data['is_active'] is True or data['is_active'] in TRUE_VALUES
+        return True
+
+    async def update_user(self, request):
+        if not self.__update(request.match_info['user_id'], dict(await request.post())):
+            return web.json_response({'detail': 'Not found.'}, status=HTTPStatus.NOT_FOUND)
+        return web.json_response(self.users[int(request.match_info['user_id'])])
+
+    async def bulk_update(self, request):
+        return web.json_response([
+            {'user_id': item['user_id'],
+             'status': HTTPStatus.OK if self.__update(item['user_id'], item) else HTTPStatus.NOT_FOUND}
+            for item in await request.json()])
+
+    async def get_types(self, request):
+        return self.items(request, self.types)
+
+    async def get_faculties(self, request):
+        type_pid = int(request.match_info['type_pid'])
+        return self.items(request, {pid: name for (parent, pid), name in self.faculties.items()
+                                   if parent == type_pid})
+
+    async def get_profiles(self, request):
+        key = (int(request.match_info['type_pid']), int(request.match_info['faculty_pid']))
+        return self.items(request, {pid: name for (*parent, pid), name in self.profiles.items()
+                                   if tuple(parent) == key})
+
+    async def get_description(self, request):
+        key = tuple(int(request.match_info[name]) for name in ('type_pid', 'faculty_pid', 'profile_pid'))
+        if key not in self.profiles:
+            return web.json_response([])
+        description = f'{self.profiles[key]}: описание профиля, условия поступления и обучения'
+        return self.items(request, {key[2]: description})
+
+    async def start(self, host='127.0.0.1', port=8765):
+        """Функция для запуска сервера
+        Returns:
+            str: адрес API в формате URL_API
+        """
+        self.__runner = web.AppRunner(self.app)
+        await self.__runner.setup()
+        await web.TCPSite(self.__runner, host, port).start()
+        return f'http://{host}:{port}/'
+
+    async def stop(self):
+        if self.__runner is not None:
+            await self.__runner.cleanup()
+            self.__runner = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Имитация API CampBotControl')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.005, help='средняя задержка ответа, с')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='доля ответов 500')
+    parser.add_argument('--admin', type=int, action='append', default=[], help='id администратора')
+    parser.add_argument('--no-conditional', action='store_true', help='не отдавать ETag и 304')
+    args = parser.parse_args()
+    api = MockApi(latency=args.latency, error_rate=args.error_rate, admins=args.admin,
+                  conditional=not args.no_conditional)
+    web.run_app(api.app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
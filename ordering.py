@@ -0,0 +1,188 @@
+import asyncio
+import logging
+
+import aiohttp
+from aiogram import Bot, Dispatcher
+from aiohttp.helpers import sentinel
+
+from config import UPDATE_CONCURRENCY, UPDATE_USER_QUEUE, UPDATE_MAX_PENDING
+
+logger = logging.getLogger(__name__)
+
+# максимальное количество обновлений в одном ответе getUpdates
+GET_UPDATES_LIMIT = 100
+
+# поля обновления, из которых берется отправитель
+UPDATE_FIELDS = ('message', 'edited_message', 'callback_query', 'inline_query', 'chosen_inline_result',
+                 'shipping_query', 'pre_checkout_query', 'my_chat_member', 'chat_member', 'chat_join_request')
+
+
+class UserQueue:
+    """Очередь обновлений одного пользователя: asyncio.Lock пропускает
+    ожидающих в порядке очереди, pending - количество обновлений в очереди"""
+    __slots__ = ('lock', 'pending')
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+
+def update_user_id(update):
+    """Функция для получения id отправителя обновления
+    Returns:
+        int: id пользователя или None для обновлений без отправителя
+    """
+    for field in UPDATE_FIELDS:
+        event = getattr(update, field, None)
+        if event is not None and event.from_user is not None:
+            return event.from_user.id
+    return None
+
+
+class OrderedDispatcher(Dispatcher):
+    """Dispatcher, обрабатывающий обновления разных пользователей параллельно,
+    а обновления одного пользователя строго по очереди, поэтому повторные
+    нажатия не приводят к гонкам при чтении и записи состояния FSM.
+    Одновременно выполняется не более concurrency обработчиков, в очереди
+    пользователя не более user_queue обновлений (лишние отбрасываются),
+    всего в обработке не более max_pending обновлений: start_polling запрашивает
+    getUpdates только при свободном месте и не больше обновлений, чем осталось мест,
+    поэтому лишние обновления ожидают на стороне Telegram, а не в памяти бота.
+    Очередь пользователя удаляется, как только в ней не остается обновлений.
+    """
+
+    def __init__(self, *args, concurrency=UPDATE_CONCURRENCY, user_queue=UPDATE_USER_QUEUE,
+                 max_pending=UPDATE_MAX_PENDING, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.concurrency = concurrency
+        self.user_queue = user_queue
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.__users = {}
+        self.__tasks = set()
+        self.__running = None
+        self.__released = None
+
+    def __init_limits(self):
+        # семафор и событие создаются в работающем цикле событий
+        if self.__running is None:
+            self.__running = asyncio.Semaphore(self.concurrency)
+            self.__released = asyncio.Event()
+
+    async def process_update(self, update):
+        """Функция для обработки обновления в очереди его отправителя"""
+        self.__init_limits()
+        user_id = update_user_id(update)
+        if user_id is None:
+            async with self.__running:
+                return await super().process_update(update)
+        queue = self.__users.get(user_id)
+        if queue is None:
+            queue = self.__users[user_id] = UserQueue()
+        if queue.pending >= self.user_queue:
+            self.dropped += 1
+            logger.warning('Очередь пользователя %s переполнена, обновление %s отброшено',
+                           user_id, update.update_id)
+            return None
+        queue.pending += 1
+        try:
+            async with queue.lock:
+                async with self.__running:
+                    return await super().process_update(update)
+        finally:
+            queue.pending -= 1
+            if not queue.pending:
+                del self.__users[user_id]
+
+    async def process_updates(self, updates, fast=True):
+        """Функция для запуска обработки пачки обновлений в фоне, чтобы медленный
+        пользователь не задерживал получение следующих обновлений.
+        Количество обновлений ограничивается в start_polling до запроса getUpdates
+        """
+        self.__init_limits()
+        for update in updates:
+            task = asyncio.create_task(self.__process_in_background(update))
+            self.__tasks.add(task)
+            task.add_done_callback(self.__task_done)
+        return []
+
+    async def __process_in_background(self, update):
+        try:
+            # через updates_handler, чтобы срабатывали middleware уровня обновления
+            await self.updates_handler.notify(update)
+        except Exception as error:
+            logger.exception(error)
+
+    def __task_done(self, task):
+        self.__tasks.discard(task)
+        self.__released.set()
+
+    async def wait_capacity(self):
+        """Функция для ожидания свободного места для обновлений в фоновой обработке
+        Returns:
+            int: количество обновлений, которое можно принять
+        """
+        self.__init_limits()
+        while len(self.__tasks) >= self.max_pending:
+            self.__released.clear()
+            await self.__released.wait()
+        return self.max_pending - len(self.__tasks)
+
+    async def start_polling(self, timeout=20, relax=0.1, limit=None, reset_webhook=None, fast=True,
+                            error_sleep=5, allowed_updates=None):
+        """Функция для получения обновлений long polling с ограничением max_pending.
+        В отличие от Dispatcher.start_polling обработка пачки запускается до следующего
+        запроса getUpdates, а сам запрос ожидает свободного места и ограничивает limit
+        количеством свободных мест
+        """
+        if self._polling:
+            raise RuntimeError('Polling already started')
+        logger.info('Start polling.')
+        Dispatcher.set_current(self)
+        Bot.set_current(self.bot)
+        if reset_webhook is None:
+            await self.reset_webhook(check=False)
+        if reset_webhook:
+            await self.reset_webhook(check=True)
+        self._polling = True
+        offset = None
+        try:
+            request_timeout = None
+            if self.bot.timeout is not sentinel and timeout is not None:
+                request_timeout = aiohttp.ClientTimeout(total=self.bot.timeout.total + timeout or 1)
+            while self._polling:
+                capacity = await self.wait_capacity()
+                try:
+                    with self.bot.request_timeout(request_timeout):
+                        updates = await self.bot.get_updates(limit=min(limit or GET_UPDATES_LIMIT, capacity),
+                                                             offset=offset, timeout=timeout,
+                                                             allowed_updates=allowed_updates)
+                except asyncio.CancelledError:
+                    break
+                except Exception as error:
+                    logger.exception('Ошибка получения обновлений: %s', error)
+                    await asyncio.sleep(error_sleep)
+                    continue
+                if updates:
+                    offset = updates[-1].update_id + 1
+                    await self.process_updates(updates, fast)
+                if relax:
+                    await asyncio.sleep(relax)
+        finally:
+            self._close_waiter.set_result(None)
+            logger.warning('Polling is stopped.')
+
+    async def drain(self, timeout=None):
+        """Функция для ожидания обработки обновлений, запущенных в фоне"""
+        if self.__tasks:
+            logger.info('Ожидаем обработку %s обновлений', len(self.__tasks))
+            await asyncio.wait(set(self.__tasks), timeout=timeout)
+
+    def stats(self):
+        """Функция для получения состояния очередей
+        Returns:
+            dict: users - пользователей с обновлениями в очереди, pending - обновлений
+            в очереди, in_flight - обновлений в фоновой обработке, dropped - отброшено
+        """
+        return {'users': len(self.__users), 'pending': sum(queue.pending for queue in self.__users.values()),
+                'in_flight': len(self.__tasks), 'dropped': self.dropped}
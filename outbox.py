@@ -0,0 +1,265 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (OUTBOX_DB_PATH, OUTBOX_BATCH_SIZE, OUTBOX_INTERVAL, OUTBOX_MAX_ATTEMPTS, OUTBOX_BACKOFF_BASE,
+                    OUTBOX_BACKOFF_CAP, BULK_CONCURRENCY, API_BULK_UPDATE)
+from resilience import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+CREATE_USER = 'create_user'
+INFORMATION_UPDATE = 'information_update'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    operation TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    on_success TEXT NOT NULL DEFAULT '[]',
+    on_failure TEXT NOT NULL DEFAULT '[]',
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    created_at REAL NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (status, next_attempt);
+"""
+
+
+def idempotency_key(operation, message):
+    """Функция для формирования ключа идемпотентности по сообщению пользователя,
+    повторная доставка того же обновления не создает новую запись"""
+    return f'{operation}:{message.chat.id}:{message.message_id}'
+
+
+def outbox_message(chat_id, text, reply_markup=None):
+    """Функция для формирования уведомления, отправляемого после доставки записи
+    Args:
+        chat_id (int): id чата
+        text (str): текст сообщения
+        reply_markup: клавиатура aiogram
+    Returns:
+        list: уведомление в виде, пригодном для сохранения в json
+    """
+    return [chat_id, text, reply_markup.to_python() if reply_markup is not None else None]
+
+
+class Outbox:
+    """Очередь отложенной записи в API (write-behind) для регистрации и активации.
+    Записи сохраняются в sqlite до ответа пользователю и доставляются в фоне
+    пачками до batch_size записей: сначала регистрации, затем обновления пользователей
+    (одним запросом, если API поддерживает массовое обновление). Каждая запись
+    имеет ключ идемпотентности, повтор записи с тем же ключом не добавляется,
+    ключ передается в API заголовком Idempotency-Key. При ошибках запись повторяется
+    с экспоненциальной паузой, после max_attempts попыток помечается failed.
+    После доставки или окончательной ошибки отправляются сохраненные уведомления.
+    """
+
+    def __init__(self, api, notify, path=OUTBOX_DB_PATH, batch_size=OUTBOX_BATCH_SIZE, interval=OUTBOX_INTERVAL,
+                 max_attempts=OUTBOX_MAX_ATTEMPTS, concurrency=BULK_CONCURRENCY,
+                 use_bulk_endpoint=API_BULK_UPDATE) -> None:
+        self.api = api
+        self.notify = notify
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.concurrency = concurrency
+        self.use_bulk_endpoint = use_bulk_endpoint
+        # user_id с недоставленной регистрацией
+        self.pending_registrations = set()
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+        self.__connection = None
+        self.__wakeup = None
+        self.__task = None
+
+    async def __db(self, func, *args):
+        """Функция для выполнения запроса к sqlite в отдельном потоке"""
+        return await asyncio.get_running_loop().run_in_executor(self.__executor, func, *args)
+
+    def __connect(self):
+        self.__connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.__connection.executescript(SCHEMA)
+
+    def __execute(self, query, params=()):
+        with self.__connection:
+            return self.__connection.execute(query, params).fetchall()
+
+    async def start(self):
+        """Функция для открытия базы и запуска фоновой доставки"""
+        if self.__task is not None:
+            return
+        await self.__db(self.__connect)
+        rows = await self.__db(self.__execute, "SELECT user_id FROM outbox WHERE operation = ? AND status = 'pending'",
+                               (CREATE_USER,))
+        self.pending_registrations = {user_id for (user_id,) in rows}
+        self.__wakeup = asyncio.Event()
+        self.__task = asyncio.create_task(self.__run())
+
+    async def stop(self):
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+            self.__task = None
+        if self.__connection is not None:
+            await self.__db(self.__connection.close)
+            self.__connection = None
+
+    async def put(self, operation, payload, idempotency_key, on_success=(), on_failure=()):
+        """Функция для сохранения записи в очередь
+        Args:
+            operation (str): create_user или information_update
+            payload (dict): данные запроса, должны содержать user_id
+            idempotency_key (str): ключ идемпотентности
+            on_success (iterable): уведомления outbox_message после доставки
+            on_failure (iterable): уведомления outbox_message после окончательной ошибки
+        Returns:
+            bool: True если запись добавлена, False если запись с таким ключом уже есть
+        """
+        user_id = str(payload['user_id'])
+
+        def insert():
+            with self.__connection:
+                return self.__connection.execute(
+                    'INSERT OR IGNORE INTO outbox (idempotency_key, operation, user_id, payload, on_success, '
+                    'on_failure, next_attempt, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (idempotency_key, operation, user_id, json.dumps(payload, ensure_ascii=False),
+                     json.dumps(list(on_success), ensure_ascii=False), json.dumps(list(on_failure), ensure_ascii=False),
+                     time.time(), time.time())).rowcount
+
+        added = bool(await self.__db(insert))
+        if added:
+            if operation == CREATE_USER:
+                self.pending_registrations.add(user_id)
+            self.__wakeup.set()
+        return added
+
+    async def stats(self):
+        """Функция для получения состояния очереди
+        Returns:
+            dict: depth - недоставленных записей, failed - записей с окончательной ошибкой,
+            oldest_age - возраст самой старой недоставленной записи в секундах
+        """
+        rows = await self.__db(self.__execute, 'SELECT status, COUNT(*), MIN(created_at) FROM outbox GROUP BY status')
+        counts = {status: (count, oldest) for status, count, oldest in rows}
+        depth, oldest = counts.get('pending', (0, None))
+        return {'depth': depth, 'failed': counts.get('failed', (0, None))[0],
+                'oldest_age': time.time() - oldest if oldest is not None else 0.0}
+
+    async def __run(self):
+        while True:
+            # сброс до выборки, чтобы запись, добавленная во время доставки, не ждала interval
+            self.__wakeup.clear()
+            try:
+                delivered = await self.__deliver_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.exception('Ошибка доставки очереди записи в API: %s', error)
+                delivered = 0
+            if delivered < self.batch_size:
+                try:
+                    await asyncio.wait_for(self.__wakeup.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def __deliver_batch(self):
+        """Функция для доставки одной пачки записей, срок повтора которых наступил
+        Returns:
+            int: количество обработанных записей
+        """
+        rows = await self.__db(self.__execute,
+                               "SELECT id, idempotency_key, operation, user_id, payload, attempts, on_success, "
+                               "on_failure FROM outbox WHERE status = 'pending' AND next_attempt <= ? "
+                               "ORDER BY id LIMIT ?", (time.time(), self.batch_size))
+        if not rows:
+            return 0
+        results = await self.__deliver_creates([row for row in rows if row[2] == CREATE_USER])
+        results.update(await self.__deliver_updates([row for row in rows if row[2] == INFORMATION_UPDATE]))
+        for operation, user_id, messages in await self.__db(self.__save_results, rows, results):
+            if operation == CREATE_USER:
+                self.pending_registrations.discard(user_id)
+            for chat_id, text, reply_markup in json.loads(messages):
+                self.notify(chat_id, text, json.dumps(reply_markup, ensure_ascii=False) if reply_markup else None)
+        return len(rows)
+
+    async def __gather(self, rows, deliver):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def guarded(row):
+            async with semaphore:
+                try:
+                    return await deliver(row)
+                except Exception as error:
+                    return error
+
+        results = await asyncio.gather(*(guarded(row) for row in rows))
+        return {row[0]: result for row, result in zip(rows, results)}
+
+    async def __deliver_creates(self, rows):
+        async def deliver(row):
+            key, user_id, payload = row[1], row[3], row[4]
+            try:
+                await self.api.create_user(json.loads(payload), idempotency_key=key)
+            except Exception:
+                # предыдущая попытка могла дойти до API, но ответ был потерян
+                if (await self.api.get_client_data(user_id)).get('is_exist'):
+                    return True
+                raise
+            return True
+
+        return await self.__gather(rows, deliver)
+
+    async def __deliver_updates(self, rows):
+        if not rows:
+            return {}
+        if self.use_bulk_endpoint:
+            try:
+                statuses = await self.api.bulk_information_update([json.loads(row[4]) for row in rows])
+            except Exception as error:
+                return {row[0]: error for row in rows}
+            return {row[0]: statuses.get(row[3], False) for row in rows}
+        return await self.__gather(
+            rows, lambda row: self.api.information_update(json.loads(row[4]), idempotency_key=row[1]))
+
+    def __save_results(self, rows, results):
+        """Функция для сохранения результатов доставки пачки одной транзакцией
+        Returns:
+            list: (operation, user_id, уведомления в json) завершенных записей
+        """
+        created = {row[3] for row in rows if row[2] == CREATE_USER and results[row[0]] is True}
+        registering = {user_id for (user_id,) in self.__connection.execute(
+            "SELECT user_id FROM outbox WHERE operation = ? AND status = 'pending'", (CREATE_USER,))} - created
+        finished = []
+        with self.__connection:
+            for row_id, key, operation, user_id, payload, attempts, on_success, on_failure in rows:
+                result = results[row_id]
+                if result is True:
+                    self.__connection.execute('DELETE FROM outbox WHERE id = ?', (row_id,))
+                    finished.append((operation, user_id, on_success))
+                    continue
+                attempts += 1
+                error = 'учетная запись не найдена' if result is False else str(result)
+                # пользователь не найден - ошибка окончательная, если его регистрация не ожидает доставки
+                retry = result is not False or user_id in registering
+                if retry and attempts < self.max_attempts:
+                    delay = backoff_delay(attempts - 1, OUTBOX_BACKOFF_BASE, OUTBOX_BACKOFF_CAP)
+                    self.__connection.execute('UPDATE outbox SET attempts = ?, next_attempt = ?, error = ? '
+                                              'WHERE id = ?', (attempts, time.time() + delay, error, row_id))
+                    logger.warning('Запись %s %s не доставлена (%s), попытка %s', operation, key, error, attempts)
+                else:
+                    self.__connection.execute("UPDATE outbox SET status = 'failed', attempts = ?, error = ? "
+                                              "WHERE id = ?", (attempts, error, row_id))
+                    logger.error('Запись %s %s не доставлена: %s', operation, key, error)
+                    finished.append((operation, user_id, on_failure))
+        return finished
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+
+from cache import catalog_key
+from config import PREFETCH_CONCURRENCY, PREFETCH_LIMIT, PREFETCH_TTL
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """Упреждающая загрузка следующего уровня каталога, пока пользователь выбирает кнопку.
+    Для показанных вариантов в фоне загружаются списки факультетов, профилей или описания,
+    которых нет в снимке каталога, результат хранится в кэше каталога ttl секунд.
+    Одновременно выполняется не более concurrency загрузок, на пользователя - одна
+    фоновая задача: при переходе пользователя дальше незапущенные загрузки отменяются.
+    """
+
+    def __init__(self, catalog, concurrency=PREFETCH_CONCURRENCY, limit=PREFETCH_LIMIT, ttl=PREFETCH_TTL) -> None:
+        self.catalog = catalog
+        self.api = catalog.api
+        self.limit = limit
+        self.ttl = ttl
+        self.loaded = 0
+        self.cancelled = 0
+        self.__concurrency = concurrency
+        self.__semaphore = None
+        self.__tasks = {}
+        self.__loads = set()
+
+    def schedule(self, user_id, node, pids):
+        """Функция для запуска загрузки дочерних узлов показанных пользователю вариантов
+        Args:
+            user_id (int): id пользователя, предыдущая загрузка для него отменяется
+            node (tuple): ключ показанного узла каталога, 0 или None - уровень не выбран
+            pids (iterable): id показанных вариантов
+        """
+        prefix = tuple(int(pid) for pid in node if pid)
+        keys = [catalog_key(*prefix, pid) for pid in list(pids)[:self.limit]]
+        keys = [key for key in keys if not self.catalog.contains(key) and key not in self.api.catalog_cache]
+        self.cancel(user_id)
+        if not keys:
+            return
+        task = asyncio.create_task(self.__run(keys))
+        self.__tasks[user_id] = task
+        task.add_done_callback(lambda done: self.__forget(user_id, done))
+
+    def __forget(self, user_id, task):
+        if self.__tasks.get(user_id) is task:
+            del self.__tasks[user_id]
+
+    def cancel(self, user_id):
+        """Функция для отмены незапущенных загрузок пользователя"""
+        task = self.__tasks.pop(user_id, None)
+        if task is not None and not task.done():
+            task.cancel()
+            self.cancelled += 1
+
+    async def __load(self, key):
+        try:
+            await self.api.prefetch(key, self.ttl)
+            self.loaded += 1
+        except Exception as error:
+            logger.debug('Не удалось загрузить узел каталога %s заранее: %s', key, error)
+
+    async def __guarded_load(self, key):
+        await self.__semaphore.acquire()
+        # начатая загрузка не прерывается: ее результат может ожидать обработчик другого пользователя,
+        # место в семафоре освобождается по ее завершении
+        task = asyncio.create_task(self.__load(key))
+        self.__loads.add(task)
+        task.add_done_callback(self.__load_done)
+        await asyncio.shield(task)
+
+    def __load_done(self, task):
+        self.__loads.discard(task)
+        self.__semaphore.release()
+
+    async def __run(self, keys):
+        if self.__semaphore is None:
+            self.__semaphore = asyncio.Semaphore(self.__concurrency)
+        await asyncio.gather(*(self.__guarded_load(key) for key in keys))
+
+    async def stop(self):
+        """Функция для отмены всех фоновых загрузок, в том числе начатых,
+        чтобы пул соединений к API закрывался без запросов в процессе"""
+        tasks = list(self.__tasks.values()) + list(self.__loads)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.__tasks.clear()
@@ -0,0 +1,88 @@
+import logging
+import random
+import time
+
+from config import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, API_BACKOFF_BASE, API_BACKOFF_CAP
+from exceptions import BackendUnavailable
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def backoff_delay(attempt, base=API_BACKOFF_BASE, cap=API_BACKOFF_CAP):
+    """Функция для расчета паузы перед повтором запроса (экспонента с полным jitter)
+    Args:
+        attempt (int): номер повтора, начиная с 0
+        base (float): базовая пауза в секундах
+        cap (float): максимальная пауза в секундах
+    Returns:
+        float: пауза в секундах
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Автоматический выключатель запросов к API.
+    После failure_threshold ошибок подряд запросы отклоняются без обращения к API
+    в течение reset_timeout секунд, затем пропускается один пробный запрос:
+    при успехе выключатель замыкается, при ошибке снова размыкается.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.rejected = 0
+        self.__trial = False
+
+    def before_request(self):
+        """Функция для проверки, можно ли отправить запрос
+        Raises:
+            BackendUnavailable: выключатель разомкнут
+        """
+        if self.state == CLOSED:
+            return
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self.__trial = False
+        if self.state == HALF_OPEN and not self.__trial:
+            self.__trial = True
+            return
+        self.rejected += 1
+        raise BackendUnavailable('API временно недоступен, запрос отклонен')
+
+    def release_trial(self):
+        """Функция для освобождения пробного запроса, завершившегося без ответа API,
+        например при отмене, чтобы следующий запрос мог стать пробным"""
+        self.__trial = False
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info('API снова доступен, выключатель замкнут')
+        self.state = CLOSED
+        self.failures = 0
+        self.__trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                logger.warning('API недоступен, выключатель разомкнут на %s с', self.reset_timeout)
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self.__trial = False
+
+    def status(self):
+        """Функция для получения состояния выключателя
+        Returns:
+            dict: state, failures, rejected, retry_in
+        """
+        retry_in = None
+        if self.state == OPEN:
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+        return {'state': self.state, 'failures': self.failures, 'rejected': self.rejected, 'retry_in': retry_in}
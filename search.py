@@ -0,0 +1,103 @@
+import logging
+import re
+from collections import Counter, defaultdict
+
+from config import SEARCH_LIMIT, SEARCH_MIN_SCORE
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text):
+    """Функция для приведения текста к виду для поиска:
+    нижний регистр, ё заменяется на е, знаки препинания удаляются
+    """
+    return ' '.join(re.findall(r'\w+', text.casefold().replace('ё', 'е')))
+
+
+def trigrams(text):
+    """Функция для получения множества триграмм слов текста"""
+    grams = set()
+    for word in normalize(text).split():
+        word = f' {word} '
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+
+class SearchIndex:
+    """Триграммный индекс профилей каталога по названиям типа образования,
+    факультета и профиля. При смене версии каталога переиндексируются
+    только добавленные, удаленные и измененные профили.
+    """
+
+    def __init__(self, limit=SEARCH_LIMIT, min_score=SEARCH_MIN_SCORE) -> None:
+        self.limit = limit
+        self.min_score = min_score
+        self.entries = {}
+        self.postings = defaultdict(set)
+        self.version = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __remove(self, path):
+        names, grams = self.entries.pop(path)
+        for gram in grams:
+            self.postings[gram].discard(path)
+            if not self.postings[gram]:
+                del self.postings[gram]
+
+    def __add(self, path, names):
+        grams = trigrams(' '.join(names))
+        self.entries[path] = (names, grams)
+        for gram in grams:
+            self.postings[gram].add(path)
+
+    def update(self, tree):
+        """Функция для обновления индекса по снимку каталога
+        Args:
+            tree (CatalogTree): снимок каталога
+        """
+        if tree.version == self.version:
+            return
+        type_names = {pid: name for name, pid in tree.types.items()}
+        faculty_names = {(type_pid, pid): name for type_pid, items in tree.faculties.items()
+                         for name, pid in items.items()}
+        paths = {}
+        for (type_pid, faculty_pid), items in tree.profiles.items():
+            for name, pid in items.items():
+                paths[(type_pid, faculty_pid, pid)] = (
+                    type_names.get(type_pid, ''), faculty_names.get((type_pid, faculty_pid), ''), name)
+        removed = [path for path, (names, _) in self.entries.items() if paths.get(path) != names]
+        for path in removed:
+            self.__remove(path)
+        added = [path for path in paths if path not in self.entries]
+        for path in added:
+            self.__add(path, paths[path])
+        self.version = tree.version
+        logger.info('Поисковый индекс обновлен до версии %s: удалено %s, добавлено %s',
+                    tree.version, len(removed), len(added))
+
+    def search(self, query, limit=None):
+        """Функция для поиска профилей по тексту
+        Args:
+            query (str): текст запроса
+            limit (int): максимальное количество результатов
+        Returns:
+            list: кортежи (path, names, score) в порядке убывания релевантности,
+            path - (type_pid, faculty_pid, profile_pid), names - названия
+        """
+        grams = trigrams(query)
+        if not grams:
+            return []
+        scores = Counter()
+        for gram in grams:
+            scores.update(self.postings.get(gram, ()))
+        results = []
+        for path, shared in scores.most_common():
+            score = shared / len(grams)
+            if score < self.min_score:
+                break
+            results.append((path, self.entries[path][0], score))
+            if len(results) == (limit or self.limit):
+                break
+        return results
@@ -25,12 +25,35 @@ class Activations(StatesGroup):
     department = State()
 
 
+class BulkActivations(StatesGroup):
+    """Класс для состояний массовой активации пользователей
+    payload - запрос списка user_id:department или csv файла
+    """
+    payload = State()
+
+
+class Deactivations(StatesGroup):
+    """Класс для состояний деактивации пользователей
+    user_ids - запрос списка ID Telegram
+    """
+    user_ids = State()
+
+
+class Broadcast(StatesGroup):
+    """Класс для состояний рассылки
+    text - запрос текста рассылки
+    """
+    text = State()
+
+
 class GetMessage(StatesGroup):
     """Класс для получения итогового сообщения
     type_traning - запрос типа обучения
     faculty - запрос факультета
     profile - запрос профиля
     last_state - установка последнего статуса для переходов в меню
+    В данных состояния хранятся только id выбранных type_traning, faculty, profile
+    и catalog_version, имена кнопок сопоставляются с id через общий индекс каталога
     """
     type_traning = State()
     faculty = State()
@@ -0,0 +1,258 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from aiogram.dispatcher.storage import BaseStorage
+
+from config import FSM_STORAGE, FSM_REDIS_URL, FSM_STATE_TTL, FSM_FILE_PATH
+
+logger = logging.getLogger(__name__)
+
+
+def dump_data(data):
+    """Функция для компактной сериализации данных состояния"""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+class RedisStorage(BaseStorage):
+    """Хранилище состояний FSM в Redis/KeyDB.
+    Состояние и данные пользователя хранятся в одном hash и читаются/пишутся
+    конвейером (pipeline) за один запрос. Каждая запись живет state_ttl секунд
+    с момента последнего изменения, брошенные регистрации удаляются автоматически.
+    Данные не перезаписываются, если не изменились с момента последнего чтения
+    в этом процессе (состояние пользователя обслуживается одним процессом).
+    """
+
+    def __init__(self, url=FSM_REDIS_URL, state_ttl=FSM_STATE_TTL, prefix='fsm', redis=None,
+                 seen_size=10000) -> None:
+        if redis is None:
+            from redis import asyncio as aioredis
+            redis = aioredis.from_url(url)
+        self.redis = redis
+        self.state_ttl = state_ttl
+        self.prefix = prefix
+        self.seen_size = seen_size
+        self.__seen = OrderedDict()
+
+    def key(self, chat, user):
+        return f'{self.prefix}:{chat}:{user}'
+
+    def __remember(self, key, raw):
+        """Запоминаем последнее прочитанное или записанное значение данных (None - данных нет)"""
+        self.__seen[key] = raw
+        self.__seen.move_to_end(key)
+        while len(self.__seen) > self.seen_size:
+            self.__seen.popitem(last=False)
+
+    async def iter_states(self, count=500):
+        """Функция для обхода текущих состояний всех пользователей.
+        Состояния ключей каждой страницы SCAN читаются одним конвейером
+        Args:
+            count (int): примерное количество ключей на странице SCAN
+        """
+        cursor = 0
+        while True:
+            cursor, keys = await self.redis.scan(cursor, match=f'{self.prefix}:*', count=count)
+            if keys:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        pipe.hget(key, 'state')
+                    states = await pipe.execute()
+                for state in states:
+                    if state is not None:
+                        yield state.decode() if isinstance(state, bytes) else state
+            if not cursor:
+                break
+
+    async def close(self):
+        await self.redis.close()
+
+    async def wait_closed(self):
+        return True
+
+    async def get_record(self, *, chat=None, user=None):
+        """Функция для чтения состояния и данных за один запрос
+        Returns:
+            tuple: (state, data)
+        """
+        chat, user = self.check_address(chat=chat, user=user)
+        key = self.key(chat, user)
+        state, raw = await self.redis.hmget(key, 'state', 'data')
+        if isinstance(raw, bytes):
+            raw = raw.decode()
+        self.__remember(key, raw)
+        data = {} if raw is None else json.loads(raw)
+        if isinstance(state, bytes):
+            state = state.decode()
+        return state, data
+
+    async def get_state(self, *, chat=None, user=None, default=None):
+        state, _ = await self.get_record(chat=chat, user=user)
+        return default if state is None else state
+
+    async def get_data(self, *, chat=None, user=None, default=None):
+        _, data = await self.get_record(chat=chat, user=user)
+        return data or default or {}
+
+    async def set_state(self, *, chat=None, user=None, state=None):
+        chat, user = self.check_address(chat=chat, user=user)
+        key = self.key(chat, user)
+        state = self.resolve_state(state)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if state is None:
+                pipe.hdel(key, 'state')
+            else:
+                pipe.hset(key, 'state', state)
+            pipe.expire(key, self.state_ttl)
+            await pipe.execute()
+
+    async def set_data(self, *, chat=None, user=None, data=None):
+        chat, user = self.check_address(chat=chat, user=user)
+        key = self.key(chat, user)
+        raw = dump_data(data) if data else None
+        if key in self.__seen and self.__seen[key] == raw:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if raw is None:
+                pipe.hdel(key, 'data')
+            else:
+                pipe.hset(key, 'data', raw)
+            pipe.expire(key, self.state_ttl)
+            await pipe.execute()
+        self.__remember(key, raw)
+
+    async def update_data(self, *, chat=None, user=None, data=None, **kwargs):
+        if data is None:
+            data = {}
+        temp_data = await self.get_data(chat=chat, user=user, default={})
+        temp_data.update(data, **kwargs)
+        await self.set_data(chat=chat, user=user, data=temp_data)
+
+    async def reset_state(self, *, chat=None, user=None, with_data=True):
+        chat, user = self.check_address(chat=chat, user=user)
+        key = self.key(chat, user)
+        if with_data:
+            await self.redis.delete(key)
+            self.__remember(key, None)
+        else:
+            await self.set_state(chat=chat, user=user, state=None)
+
+
+class FileStorage(BaseStorage):
+    """Хранилище состояний FSM в json файле для одного процесса и локальных тестов.
+    Записи хранятся в памяти, файл перезаписывается в фоне не чаще flush_delay секунд.
+    Записи старше state_ttl секунд с момента последнего изменения удаляются.
+    """
+
+    def __init__(self, path=FSM_FILE_PATH, state_ttl=FSM_STATE_TTL, flush_delay=1.0) -> None:
+        self.path = path
+        self.state_ttl = state_ttl
+        self.flush_delay = flush_delay
+        self.records = self.__read()
+        self.__flush_task = None
+
+    def __read(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError) as error:
+            logger.warning('Не удалось прочитать состояния FSM из %s: %s', self.path, error)
+            return {}
+
+    def __write(self, records):
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(dump_data(records))
+        os.replace(tmp_path, self.path)
+
+    async def flush(self):
+        """Функция для записи актуальных состояний в файл"""
+        now = time.time()
+        self.records = {key: record for key, record in self.records.items() if record['expires'] > now}
+        await asyncio.get_running_loop().run_in_executor(None, self.__write, dict(self.records))
+
+    async def __delayed_flush(self):
+        await asyncio.sleep(self.flush_delay)
+        self.__flush_task = None
+        await self.flush()
+
+    def __touch(self, key):
+        self.records[key]['expires'] = time.time() + self.state_ttl
+        if self.__flush_task is None:
+            self.__flush_task = asyncio.create_task(self.__delayed_flush())
+
+    def __record(self, chat, user):
+        chat, user = self.check_address(chat=chat, user=user)
+        key = f'{chat}:{user}'
+        record = self.records.get(key)
+        if record is None or record['expires'] < time.time():
+            record = self.records[key] = {'state': None, 'data': {}, 'expires': 0}
+        return key, record
+
+    async def iter_states(self):
+        """Функция для обхода текущих состояний всех пользователей"""
+        now = time.time()
+        for record in list(self.records.values()):
+            if record['state'] and record['expires'] > now:
+                yield record['state']
+
+    async def close(self):
+        if self.__flush_task is not None:
+            self.__flush_task.cancel()
+            self.__flush_task = None
+        await self.flush()
+
+    async def wait_closed(self):
+        return True
+
+    async def get_state(self, *, chat=None, user=None, default=None):
+        _, record = self.__record(chat, user)
+        return record['state'] or default
+
+    async def get_data(self, *, chat=None, user=None, default=None):
+        _, record = self.__record(chat, user)
+        return dict(record['data']) or default or {}
+
+    async def set_state(self, *, chat=None, user=None, state=None):
+        key, record = self.__record(chat, user)
+        record['state'] = self.resolve_state(state)
+        self.__touch(key)
+
+    async def set_data(self, *, chat=None, user=None, data=None):
+        key, record = self.__record(chat, user)
+        record['data'] = dict(data or {})
+        self.__touch(key)
+
+    async def update_data(self, *, chat=None, user=None, data=None, **kwargs):
+        key, record = self.__record(chat, user)
+        record['data'].update(data or {}, **kwargs)
+        self.__touch(key)
+
+    async def reset_state(self, *, chat=None, user=None, with_data=True):
+        await self.set_state(chat=chat, user=user, state=None)
+        if with_data:
+            await self.set_data(chat=chat, user=user, data={})
+
+
+def create_storage(backend=FSM_STORAGE):
+    """Функция для создания хранилища состояний FSM по настройке FSM_STORAGE
+    Args:
+        backend (str): memory, redis или file
+    Returns:
+        BaseStorage: хранилище состояний
+    Raises:
+        ValueError: неизвестное хранилище
+    """
+    if backend == 'memory':
+        return MemoryStorage()
+    if backend == 'redis':
+        return RedisStorage()
+    if backend == 'file':
+        return FileStorage()
+    raise ValueError(f'Неизвестное хранилище состояний FSM_STORAGE={backend}')
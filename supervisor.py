@@ -0,0 +1,390 @@
+"""Запуск бота в нескольких процессах.
+
+Супервизор запускает workers процессов main.py в режиме webhook на локальных портах
+и распределяет обновления между ними по id пользователя, поэтому состояние FSM
+пользователя всегда находится в одном процессе. Источник обновлений - webhook
+Telegram (или локальные POST запросы), long polling или файл с обновлениями в формате
+json lines. Процессы проверяются по GET /health и перезапускаются при падении,
+сигнал SIGHUP выполняет поочередный перезапуск всех процессов без потери обновлений.
+Общий лимит отправки SEND_GLOBAL_RATE делится между процессами поровну. Кэш данных
+пользователя хранится в процессе пользователя, поэтому активация, выполненная
+администратором в другом процессе, становится видна пользователю не позже чем через USER_CACHE_TTL секунд.
+
+    python supervisor.py --workers 4 --source polling
+    python supervisor.py --workers 2 --source replay --replay updates.jsonl
+"""
+import argparse
+import asyncio
+import hmac
+import json
+import logging
+import os
+import secrets
+import signal
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+from config import (API_TOKEN_TELEGRAM, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBAPP_HOST, WEBAPP_PORT,
+                    WEBHOOK_DRAIN_TIMEOUT, METRICS_PORT, BROADCAST_DB_PATH, OUTBOX_DB_PATH, FSM_FILE_PATH, LOG_FILE,
+                    CATALOG_SNAPSHOT_PATH, SEND_GLOBAL_RATE,
+                    SUPERVISOR_WORKERS, SUPERVISOR_BASE_PORT, SUPERVISOR_HEALTH_INTERVAL, SUPERVISOR_HEALTH_FAILURES,
+                    SUPERVISOR_START_TIMEOUT, SUPERVISOR_QUEUE_SIZE)
+from ordering import UPDATE_FIELDS
+from webhook import SECRET_HEADER
+
+logger = logging.getLogger(__name__)
+
+
+def update_user_id(update):
+    """Функция для получения id отправителя из обновления в формате json Bot API
+    Returns:
+        int: id пользователя или None
+    """
+    for field in UPDATE_FIELDS:
+        event = update.get(field)
+        if event and event.get('from'):
+            return event['from']['id']
+    return None
+
+
+def worker_path(path, index):
+    """Функция для формирования пути файла процесса: broadcast.sqlite3 -> broadcast.1.sqlite3"""
+    root, ext = os.path.splitext(path)
+    return f'{root}.{index}{ext}'
+
+
+class WorkerProcess:
+    """Процесс main.py, обрабатывающий обновления своей доли пользователей"""
+
+    def __init__(self, index, port, secret, workers=1, queue_size=SUPERVISOR_QUEUE_SIZE) -> None:
+        self.index = index
+        self.workers = workers
+        self.port = port
+        self.secret = secret
+        self.url = f'http://127.0.0.1:{port}{WEBHOOK_PATH}'
+        self.health_url = f'http://127.0.0.1:{port}/health'
+        self.queue = asyncio.Queue(queue_size)
+        self.process = None
+        self.healthy = False
+        self.restarting = False
+        self.failures = 0
+        self.restarts = 0
+        self.started_at = 0.0
+
+    def environment(self):
+        """Функция для получения переменных окружения процесса: режим webhook на своем порту
+        без регистрации webhook в Telegram, отдельные файлы состояния и логов,
+        доля общего лимита отправки сообщений"""
+        env = dict(os.environ)
+        env.update({
+            'BOT_MODE': 'webhook',
+            'WEBHOOK_URL': '',
+            'WEBHOOK_SECRET': self.secret,
+            'WEBAPP_HOST': '127.0.0.1',
+            'WEBAPP_PORT': str(self.port),
+            'METRICS_PORT': str(METRICS_PORT + self.index) if METRICS_PORT else '0',
+            'BROADCAST_DB_PATH': worker_path(BROADCAST_DB_PATH, self.index),
+            'OUTBOX_DB_PATH': worker_path(OUTBOX_DB_PATH, self.index),
+            'FSM_FILE_PATH': worker_path(FSM_FILE_PATH, self.index),
+            'LOG_FILE': worker_path(LOG_FILE, self.index),
+            # пустой путь отключает сохранение снимка
+            'CATALOG_SNAPSHOT_PATH': worker_path(CATALOG_SNAPSHOT_PATH, self.index) if CATALOG_SNAPSHOT_PATH else '',
+            'SEND_GLOBAL_RATE': str(SEND_GLOBAL_RATE / self.workers),
+        })
+        return env
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        self.healthy = False
+        self.failures = 0
+        self.started_at = time.monotonic()
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py'),
+            env=self.environment())
+        logger.info('Запущен процесс %s (pid %s) на порту %s', self.index, self.process.pid, self.port)
+
+    async def stop(self, timeout=WEBHOOK_DRAIN_TIMEOUT + 5):
+        """Функция для остановки процесса: SIGTERM, ожидание обработки начатых обновлений, затем SIGKILL"""
+        self.healthy = False
+        if not self.alive:
+            return
+        self.process.terminate()
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning('Процесс %s не остановился за %s с, завершаем принудительно', self.index, timeout)
+            self.process.kill()
+            await self.process.wait()
+
+    async def check_health(self, session):
+        """Функция для проверки состояния процесса
+        Returns:
+            bool: процесс отвечает на /health
+        """
+        try:
+            async with session.get(self.health_url, timeout=aiohttp.ClientTimeout(total=2)) as response:
+                return response.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
+
+class Supervisor:
+    """Управление процессами и маршрутизация обновлений.
+    Для каждого процесса есть очередь обновлений, которую по порядку пересылает
+    отдельная задача, поэтому обновления одного пользователя приходят в процесс по очереди,
+    а на время перезапуска процесса обновления накапливаются в очереди.
+    """
+
+    def __init__(self, workers=SUPERVISOR_WORKERS, base_port=SUPERVISOR_BASE_PORT,
+                 health_interval=SUPERVISOR_HEALTH_INTERVAL, health_failures=SUPERVISOR_HEALTH_FAILURES,
+                 start_timeout=SUPERVISOR_START_TIMEOUT) -> None:
+        secret = secrets.token_urlsafe(32)
+        self.workers = [WorkerProcess(index, base_port + index, secret, workers) for index in range(workers)]
+        self.health_interval = health_interval
+        self.health_failures = health_failures
+        self.start_timeout = start_timeout
+        self.session = None
+        self.__tasks = []
+
+    def route(self, update):
+        """Функция для выбора процесса по id пользователя обновления"""
+        user_id = update_user_id(update)
+        key = user_id if user_id is not None else update.get('update_id', 0)
+        return self.workers[hash(key) % len(self.workers)]
+
+    def submit_nowait(self, update):
+        """Функция для постановки обновления в очередь процесса
+        Returns:
+            bool: False, если очередь процесса переполнена
+        """
+        try:
+            self.route(update).queue.put_nowait(update)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def submit(self, update):
+        """Функция для постановки обновления в очередь с ожиданием свободного места"""
+        await self.route(update).queue.put(update)
+
+    async def __forward(self, worker):
+        """Функция для пересылки обновлений процессу по порядку, пока процесс
+        недоступен, пересылка повторяется"""
+        while True:
+            update = await worker.queue.get()
+            delay = 0.1
+            while True:
+                if worker.healthy:
+                    try:
+                        async with self.session.post(worker.url, json=update,
+                                                     headers={SECRET_HEADER: worker.secret}) as response:
+                            if response.status == 200:
+                                break
+                            if response.status in (400, 403):
+                                logger.error('Процесс %s отклонил обновление %s: %s', worker.index,
+                                             update.get('update_id'), response.status)
+                                break
+                    except aiohttp.ClientError as error:
+                        logger.warning('Не удалось передать обновление процессу %s: %s', worker.index, error)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 2)
+            worker.queue.task_done()
+
+    async def restart(self, worker):
+        """Функция для перезапуска процесса с ожиданием его готовности"""
+        worker.restarting = True
+        try:
+            await worker.stop()
+            worker.restarts += 1
+            await worker.start()
+            await self.wait_healthy(worker)
+        finally:
+            worker.restarting = False
+
+    async def wait_healthy(self, worker):
+        """Функция для ожидания готовности процесса не дольше start_timeout
+        Returns:
+            bool: процесс готов
+        """
+        deadline = time.monotonic() + self.start_timeout
+        while time.monotonic() < deadline and worker.alive:
+            if await worker.check_health(self.session):
+                worker.healthy = True
+                logger.info('Процесс %s готов', worker.index)
+                return True
+            await asyncio.sleep(0.5)
+        return False
+
+    async def rolling_restart(self):
+        """Функция для поочередного перезапуска процессов: следующий процесс
+        перезапускается только после готовности предыдущего"""
+        logger.info('Поочередный перезапуск %s процессов', len(self.workers))
+        for worker in self.workers:
+            await self.restart(worker)
+
+    async def __monitor(self):
+        """Функция для проверки процессов и перезапуска упавших или не отвечающих"""
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for worker in self.workers:
+                if worker.restarting:
+                    continue
+                if not worker.alive:
+                    logger.error('Процесс %s завершился с кодом %s, перезапускаем', worker.index,
+                                 worker.process.returncode if worker.process else None)
+                    asyncio.create_task(self.restart(worker))
+                    continue
+                if await worker.check_health(self.session):
+                    worker.healthy = True
+                    worker.failures = 0
+                    continue
+                worker.healthy = False
+                if time.monotonic() - worker.started_at < self.start_timeout:
+                    continue
+                worker.failures += 1
+                if worker.failures >= self.health_failures:
+                    logger.error('Процесс %s не отвечает %s проверок подряд, перезапускаем', worker.index,
+                                 worker.failures)
+                    asyncio.create_task(self.restart(worker))
+
+    def status(self):
+        """Функция для получения состояния процессов"""
+        return [{'index': worker.index, 'pid': worker.process.pid if worker.process else None,
+                 'healthy': worker.healthy, 'queue': worker.queue.qsize(), 'restarts': worker.restarts}
+                for worker in self.workers]
+
+    async def start(self):
+        self.session = aiohttp.ClientSession()
+        for worker in self.workers:
+            await worker.start()
+        await asyncio.gather(*(self.wait_healthy(worker) for worker in self.workers))
+        self.__tasks = [asyncio.create_task(self.__forward(worker)) for worker in self.workers]
+        self.__tasks.append(asyncio.create_task(self.__monitor()))
+
+    async def drain(self, timeout=WEBHOOK_DRAIN_TIMEOUT):
+        """Функция для ожидания пересылки накопленных обновлений"""
+        try:
+            await asyncio.wait_for(asyncio.gather(*(worker.queue.join() for worker in self.workers)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning('Не переданы обновления: %s', sum(worker.queue.qsize() for worker in self.workers))
+
+    async def stop(self):
+        await self.drain()
+        for task in self.__tasks:
+            task.cancel()
+        await asyncio.gather(*self.__tasks, return_exceptions=True)
+        await asyncio.gather(*(worker.stop() for worker in self.workers))
+        if self.session is not None:
+            await self.session.close()
+
+
+async def serve_webhook(supervisor, stopping, host=WEBAPP_HOST, port=WEBAPP_PORT, path=WEBHOOK_PATH,
+                        secret=WEBHOOK_SECRET, url=WEBHOOK_URL):
+    """Функция для приема обновлений POST запросами на path, обновления распределяются
+    по процессам, при переполнении очереди процесса отвечаем 503 и Telegram повторит запрос"""
+    async def handle_update(request):
+        if secret and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ''), secret):
+            return web.Response(status=403)
+        try:
+            update = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        return web.Response(status=200 if supervisor.submit_nowait(update) else 503)
+
+    async def handle_health(request):
+        workers = supervisor.status()
+        healthy = all(worker['healthy'] for worker in workers)
+        return web.json_response({'status': 'ok' if healthy else 'degraded', 'workers': workers},
+                                 status=200 if healthy else 503)
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    app.router.add_get('/health', handle_health)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info('Прием обновлений на http://%s:%s%s', host, port, path)
+    if url:
+        from aiogram import Bot
+        bot = Bot(token=API_TOKEN_TELEGRAM)
+        await bot.set_webhook(f'{url}{path}', secret_token=secret or None)
+        await (await bot.get_session()).close()
+    try:
+        await stopping.wait()
+    finally:
+        await runner.cleanup()
+
+
+async def poll(supervisor, stopping, timeout=30):
+    """Функция для получения обновлений long polling и распределения их по процессам"""
+    from aiogram import Bot
+    bot = Bot(token=API_TOKEN_TELEGRAM)
+    offset = None
+    try:
+        while not stopping.is_set():
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=timeout)
+            except Exception as error:
+                logger.warning('Ошибка получения обновлений: %s', error)
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                await supervisor.submit(update.to_python())
+                offset = update.update_id + 1
+    finally:
+        await (await bot.get_session()).close()
+
+
+async def replay(supervisor, path):
+    """Функция для передачи обновлений из файла json lines, файл может быть записан
+    benchmark.py или сохранен из webhook"""
+    count = 0
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                await supervisor.submit(json.loads(line))
+                count += 1
+    await supervisor.drain(timeout=None)
+    logger.info('Передано обновлений из %s: %s', path, count)
+
+
+async def run(args):
+    supervisor = Supervisor(workers=args.workers)
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+    loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.create_task(supervisor.rolling_restart()))
+    await supervisor.start()
+    try:
+        if args.source == 'replay':
+            await replay(supervisor, args.replay)
+        elif args.source == 'polling':
+            await poll(supervisor, stopping)
+        else:
+            await serve_webhook(supervisor, stopping)
+    finally:
+        await supervisor.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Запуск бота в нескольких процессах')
+    parser.add_argument('--workers', type=int, default=SUPERVISOR_WORKERS, help='количество процессов')
+    parser.add_argument('--source', choices=('webhook', 'polling', 'replay'), default='webhook',
+                        help='источник обновлений')
+    parser.add_argument('--replay', help='файл обновлений json lines для --source replay')
+    args = parser.parse_args()
+    if args.source == 'replay' and not args.replay:
+        parser.error('для --source replay необходимо указать --replay')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] supervisor | %(message)s')
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
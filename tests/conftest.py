@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+
+# переменные окружения читаются в config при импорте, поэтому задаются до импорта модулей бота
+WORKDIR = tempfile.mkdtemp(prefix='campbot-tests-')
+os.environ.update({
+    'URL_API': 'http://127.0.0.1:1/',
+    'API_TOKEN_TELEGRAM': '123456789:AAtesttesttesttesttesttesttesttesttest',
+    'API_TOKEN': 'test',
+    'BOT_MODE': 'polling',
+    'FSM_STORAGE': 'memory',
+    'METRICS_PORT': '0',
+    'CATALOG_SNAPSHOT_PATH': os.path.join(WORKDIR, 'catalog_snapshot.json'),
+    'BROADCAST_DB_PATH': os.path.join(WORKDIR, 'broadcast.sqlite3'),
+    'OUTBOX_DB_PATH': os.path.join(WORKDIR, 'outbox.sqlite3'),
+    'FSM_FILE_PATH': os.path.join(WORKDIR, 'fsm_storage.json'),
+    'LOG_FILE': os.path.join(WORKDIR, 'my_bot.log'),
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,48 @@
+import asyncio
+
+from aiohttp.test_utils import TestServer
+
+from cache import CachedWorkerApi, TTLCache, catalog_key
+from mock_api import MockApi
+
+
+def test_server_error_returns_stale_catalog():
+    async def scenario():
+        mock = MockApi(latency=0)
+        server = TestServer(mock.app)
+        await server.start_server()
+        api = CachedWorkerApi(str(server.make_url('/')), http2=False, retries=0)
+        await api.open()
+        try:
+            types = await api.get_type_education()
+            # запись устарела, а API отвечает 500
+            api.catalog_cache.put(catalog_key(), types, ttl=-1)
+            mock.error_rate = 1.0
+            assert await api.get_type_education() == types
+        finally:
+            await api.close()
+            await server.close()
+
+    asyncio.run(scenario())
+
+
+def test_waiting_caller_takes_over_cancelled_load():
+    async def scenario():
+        cache = TTLCache()
+        calls = []
+
+        async def loader():
+            calls.append(len(calls))
+            await asyncio.sleep(0.05)
+            return len(calls)
+
+        leader = asyncio.create_task(cache.get_or_load('key', loader))
+        await asyncio.sleep(0)
+        waiting = [asyncio.create_task(cache.get_or_load('key', loader)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await asyncio.gather(*waiting) == [2, 2, 2]
+        assert len(calls) == 2
+        assert await cache.get_or_load('key', loader) == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,53 @@
+import asyncio
+
+from aiohttp.test_utils import TestServer
+
+from mock_api import MockApi
+from utils import WorkerApi
+
+
+async def serve(mock):
+    server = TestServer(mock.app)
+    await server.start_server()
+    api = WorkerApi(url=str(server.make_url('/')), http2=False)
+    await api.open()
+    return server, api
+
+
+def test_not_modified_returns_parsed_result():
+    async def scenario():
+        mock = MockApi(latency=0)
+        server, api = await serve(mock)
+        try:
+            first = await api.get_faculties(1)
+            second = await api.get_faculties(1)
+            assert second is first
+            assert mock.not_modified == 1
+            assert api.validators.stats()['not_modified'] == 1
+            mock.faculties[(1, 1)] = 'Факультет переименован'
+            changed = await api.get_faculties(1)
+            assert changed['Факультет переименован'] == 1
+            assert api.validators.stats()['misses'] == 2
+            timing = api.timing_stats()[('GET', 'faculties')]
+            assert timing['count'] == 3 and timing['max'] <= timing['total']
+        finally:
+            await api.close()
+            await server.close()
+
+    asyncio.run(scenario())
+
+
+def test_unchanged_body_is_not_parsed_again():
+    async def scenario():
+        mock = MockApi(latency=0, conditional=False)
+        server, api = await serve(mock)
+        try:
+            first = await api.get_type_education()
+            assert await api.get_type_education() is first
+            assert mock.not_modified == 0
+            assert api.validators.stats()['unchanged'] == 1
+        finally:
+            await api.close()
+            await server.close()
+
+    asyncio.run(scenario())
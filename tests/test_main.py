@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from aiogram import Bot, Dispatcher, types
+from aiogram.bot.base import BaseBot
+from aiogram.dispatcher.filters.builtin import StateFilter
+
+import main
+from states import GetMessage
+
+
+def handler_states(handlers, callback):
+    """Функция для получения состояний, в которых вызывается обработчик"""
+    for handler in handlers.handlers:
+        if handler.handler is callback:
+            return [item.filter.states for item in handler.filters if isinstance(item.filter, StateFilter)]
+    raise LookupError(callback)
+
+
+def test_handlers_registered():
+    assert main.dp.message_handlers.handlers
+    assert main.dp.callback_query_handlers.handlers
+    assert main.dp.inline_query_handlers.handlers
+
+
+def test_callback_handlers_accept_any_state():
+    assert handler_states(main.dp.callback_query_handlers, main.inline_navigation) == [['*']]
+    assert handler_states(main.dp.callback_query_handlers, main.send_found_description) == [['*']]
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Запросы бота к Telegram, подмененные без отправки"""
+    requests = []
+
+    async def fake_request(bot, method, data=None, files=None, **kwargs):
+        data = data or {}
+        requests.append((method, data))
+        return {'message_id': len(requests), 'date': 0, 'text': data.get('text', ''),
+                'chat': {'id': int(data.get('chat_id') or 0), 'type': 'private'}}
+
+    monkeypatch.setattr(BaseBot, 'request', fake_request)
+    return requests
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    """Справочник из одного типа образования, факультета и профиля"""
+    async def get_type_education():
+        return {'Бакалавриат': 1}
+
+    async def get_faculties(type_pid):
+        return {'Экономический': 2}
+
+    monkeypatch.setattr(main.catalog, 'get_type_education', get_type_education)
+    monkeypatch.setattr(main.catalog, 'get_faculties', get_faculties)
+    return main.catalog
+
+
+def message_update(user_id, text):
+    return types.Update(**{'update_id': 1, 'message': {
+        'message_id': 1, 'date': 0, 'text': text, 'chat': {'id': user_id, 'type': 'private'},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': 'Тест'}}})
+
+
+async def dispatch(update):
+    """Обработка обновления в отдельной задаче, как при polling и webhook"""
+    Bot.set_current(main.bot)
+    Dispatcher.set_current(main.dp)
+    await asyncio.create_task(main.dp.process_update(update))
+
+
+def test_unknown_catalog_button_repeats_choice(sent, catalog):
+    async def scenario():
+        state = main.dp.current_state(chat=7, user=7)
+        await state.set_state(GetMessage.type_traning)
+        await state.set_data({'catalog_version': catalog.version})
+        await dispatch(message_update(7, 'Магистратура'))
+        assert await state.get_state() == GetMessage.type_traning.state
+        assert sent[-1][1]['text'].startswith('Такого варианта нет')
+        await dispatch(message_update(7, 'Бакалавриат'))
+        assert await state.get_state() == GetMessage.faculty.state
+        assert (await state.get_data())['type_traning'] == 1
+        await state.finish()
+
+    asyncio.run(scenario())
@@ -0,0 +1,51 @@
+import asyncio
+
+from aiogram import Bot, types
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+from ordering import OrderedDispatcher
+
+
+class BlockingMiddleware(BaseMiddleware):
+    def __init__(self) -> None:
+        super().__init__()
+        self.release = asyncio.Event()
+        self.processed = 0
+
+    async def on_pre_process_update(self, update, data):
+        await self.release.wait()
+
+    async def on_post_process_update(self, update, results, data):
+        self.processed += 1
+
+
+def test_polling_waits_for_free_slots():
+    async def scenario():
+        bot = Bot(token='123456789:AAtesttesttesttesttesttesttesttesttest')
+        dispatcher = OrderedDispatcher(bot, max_pending=3)
+        middleware = BlockingMiddleware()
+        dispatcher.middleware.setup(middleware)
+        limits = []
+        update_ids = iter(range(1, 1000))
+
+        async def get_updates(limit=None, **kwargs):
+            limits.append(limit)
+            assert dispatcher.stats()['in_flight'] + limit <= dispatcher.max_pending
+            if len(limits) == 3:
+                dispatcher.stop_polling()
+            return [types.Update(update_id=next(update_ids)) for _ in range(limit)]
+
+        bot.get_updates = get_updates
+        polling = asyncio.create_task(dispatcher.start_polling(reset_webhook=False, relax=0))
+        await asyncio.sleep(0.05)
+        # все места заняты, getUpdates не запрашивается до завершения обработки
+        assert limits == [3]
+        middleware.release.set()
+        await asyncio.wait_for(polling, 1)
+        assert limits == [3, 3, 3]
+        await dispatcher.drain()
+        # обновления проходят через middleware уровня обновления
+        assert middleware.processed == 9
+        await (await bot.get_session()).close()
+
+    asyncio.run(scenario())
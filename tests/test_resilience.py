@@ -0,0 +1,32 @@
+import asyncio
+
+from aiohttp.test_utils import TestServer
+
+from mock_api import MockApi
+from resilience import CLOSED, HALF_OPEN, CircuitBreaker
+from utils import WorkerApi
+
+
+def test_cancelled_trial_request_releases_breaker():
+    async def scenario():
+        mock = MockApi(latency=1)
+        server = TestServer(mock.app)
+        await server.start_server()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        api = WorkerApi(url=str(server.make_url('/')), http2=False, breaker=breaker)
+        await api.open()
+        try:
+            breaker.record_failure()
+            trial = asyncio.create_task(api.get_type_education())
+            await asyncio.sleep(0.05)
+            assert breaker.state == HALF_OPEN
+            trial.cancel()
+            await asyncio.gather(trial, return_exceptions=True)
+            mock.latency = 0
+            assert await api.get_type_education()
+            assert breaker.state == CLOSED
+        finally:
+            await api.close()
+            await server.close()
+
+    asyncio.run(scenario())
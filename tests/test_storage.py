@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+import pytest
+
+from storage import FileStorage, RedisStorage
+
+
+async def check_storage(storage):
+    """Общая проверка хранилища: состояние, данные, сброс и обход состояний"""
+    await storage.set_state(chat=1, user=1, state='GetMessage:faculty')
+    await storage.update_data(chat=1, user=1, type_traning=2)
+    await storage.update_data(chat=1, user=1, data={'faculty': 3})
+    assert await storage.get_state(chat=1, user=1) == 'GetMessage:faculty'
+    assert await storage.get_data(chat=1, user=1) == {'type_traning': 2, 'faculty': 3}
+    assert [state async for state in storage.iter_states()] == ['GetMessage:faculty']
+    await storage.reset_state(chat=1, user=1)
+    assert await storage.get_state(chat=1, user=1) is None
+    assert await storage.get_data(chat=1, user=1) == {}
+
+
+def test_file_storage_persists_between_instances(tmp_path):
+    path = str(tmp_path / 'fsm.json')
+
+    async def scenario():
+        storage = FileStorage(path, flush_delay=0)
+        await check_storage(storage)
+        await storage.set_state(chat=2, user=2, state='Registration:age')
+        await storage.close()
+        restored = FileStorage(path)
+        assert await restored.get_state(chat=2, user=2) == 'Registration:age'
+        await restored.close()
+
+    asyncio.run(scenario())
+
+
+def test_file_storage_expires_records(tmp_path):
+    async def scenario():
+        storage = FileStorage(str(tmp_path / 'fsm.json'), state_ttl=60, flush_delay=0)
+        await storage.set_state(chat=1, user=1, state='Registration:age')
+        storage.records['1:1']['expires'] = time.time() - 1
+        assert await storage.get_state(chat=1, user=1) is None
+        await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_redis_storage():
+    fakeredis = pytest.importorskip('fakeredis')
+
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis()
+        storage = RedisStorage(redis=redis, state_ttl=60)
+        await check_storage(storage)
+        await storage.set_state(chat=1, user=1, state='Registration:age')
+        assert 0 < await redis.ttl(storage.key(1, 1)) <= 60
+        for user in range(2, 30):
+            await storage.set_state(chat=user, user=user, state='GetMessage:faculty')
+        states = [state async for state in storage.iter_states(count=10)]
+        assert sorted(states) == ['GetMessage:faculty'] * 28 + ['Registration:age']
+        await storage.close()
+
+    asyncio.run(scenario())
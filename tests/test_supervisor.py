@@ -0,0 +1,39 @@
+import asyncio
+
+from config import SEND_GLOBAL_RATE
+from supervisor import Supervisor, update_user_id, worker_path
+
+
+def message_update(update_id, user_id):
+    return {'update_id': update_id, 'message': {'message_id': update_id, 'date': 0, 'text': 'test',
+                                                'chat': {'id': user_id, 'type': 'private'},
+                                                'from': {'id': user_id, 'is_bot': False, 'first_name': 'Тест'}}}
+
+
+def test_updates_of_one_user_go_to_one_worker():
+    async def scenario():
+        supervisor = Supervisor(workers=3)
+        assert update_user_id(message_update(1, 42)) == 42
+        workers = {supervisor.route(message_update(update_id, 42)).index for update_id in range(10)}
+        assert len(workers) == 1
+        assert {supervisor.route(message_update(1, user_id)).index for user_id in range(9)} == {0, 1, 2}
+
+    asyncio.run(scenario())
+
+
+def test_worker_environment_is_separated():
+    async def scenario():
+        supervisor = Supervisor(workers=2, base_port=9000)
+        first, second = (worker.environment() for worker in supervisor.workers)
+        assert (first['WEBAPP_PORT'], second['WEBAPP_PORT']) == ('9000', '9001')
+        assert first['WEBHOOK_URL'] == ''
+        for name in ('BROADCAST_DB_PATH', 'OUTBOX_DB_PATH', 'FSM_FILE_PATH', 'LOG_FILE', 'CATALOG_SNAPSHOT_PATH'):
+            assert first[name] != second[name]
+        assert second['CATALOG_SNAPSHOT_PATH'].endswith('catalog_snapshot.1.json')
+        assert float(first['SEND_GLOBAL_RATE']) + float(second['SEND_GLOBAL_RATE']) == SEND_GLOBAL_RATE
+
+    asyncio.run(scenario())
+
+
+def test_worker_path():
+    assert worker_path('broadcast.sqlite3', 1) == 'broadcast.1.sqlite3'
@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+from aiogram.dispatcher.handler import CancelHandler
+
+from throttling import ThrottlingMiddleware
+
+
+def test_user_warned_once_and_state_evicted_with_bucket():
+    middleware = ThrottlingMiddleware(user_rate=0.001, user_burst=1, chat_rate=1000, chat_burst=1000)
+    notified = []
+
+    async def notify():
+        notified.append(True)
+
+    async def scenario():
+        await middleware.throttle(1, 1, notify)
+        for _ in range(3):
+            with pytest.raises(CancelHandler):
+                await middleware.throttle(1, 1, notify)
+        assert len(notified) == 1
+        middleware.users.evict_idle(now=middleware.users.buckets[1].stamp + middleware.users.idle_timeout + 1)
+        assert not middleware.users.buckets
+
+    asyncio.run(scenario())
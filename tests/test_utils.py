@@ -0,0 +1,27 @@
+import asyncio
+
+from utils import InflightRequests
+
+
+def test_follower_takes_over_cancelled_load():
+    async def scenario():
+        inflight = InflightRequests()
+        calls = []
+
+        async def loader():
+            calls.append(len(calls))
+            await asyncio.sleep(0.05)
+            return len(calls)
+
+        leader = asyncio.create_task(inflight.run('url', loader))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(inflight.run('url', loader)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        # ожидающие получают результат повторной загрузки, а не CancelledError
+        assert await asyncio.gather(*followers) == [2, 2, 2]
+        assert leader.cancelled()
+        assert len(calls) == 2
+        assert inflight.stats()['size'] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,60 @@
+import asyncio
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from aiohttp.test_utils import TestClient, TestServer
+
+from webhook import SECRET_HEADER, WebhookServer
+
+SECRET = 'secret'
+# обновление в формате, в котором его отправляет Telegram
+UPDATE = {
+    'update_id': 10,
+    'message': {'message_id': 5, 'date': 1670000000, 'text': '/start',
+                'chat': {'id': 42, 'type': 'private', 'first_name': 'Тест'},
+                'from': {'id': 42, 'is_bot': False, 'first_name': 'Тест', 'language_code': 'ru'},
+                'entities': [{'offset': 0, 'length': 6, 'type': 'bot_command'}]},
+}
+
+
+class UpdateMiddleware(BaseMiddleware):
+    def __init__(self) -> None:
+        super().__init__()
+        self.updates = []
+
+    async def on_pre_process_update(self, update, data):
+        self.updates.append(update.update_id)
+
+
+def test_webhook_server():
+    async def scenario():
+        bot = Bot(token='123456789:AAtesttesttesttesttesttesttesttesttest')
+        dispatcher = Dispatcher(bot)
+        received = []
+        middleware = UpdateMiddleware()
+        dispatcher.middleware.setup(middleware)
+
+        @dispatcher.message_handler(commands=['start'])
+        async def start(message):
+            received.append((message.from_user.id, message.text))
+
+        server = WebhookServer(dispatcher, path='/webhook', secret=SECRET, url='', drain_timeout=1)
+        async with TestClient(TestServer(server.app)) as client:
+            response = await client.post('/webhook', json=UPDATE, headers={SECRET_HEADER: SECRET})
+            assert response.status == 200
+            response = await client.post('/webhook', json=UPDATE, headers={SECRET_HEADER: 'wrong'})
+            assert response.status == 403
+            response = await client.post('/webhook', data='not json', headers={SECRET_HEADER: SECRET})
+            assert response.status == 400
+            response = await client.get('/health')
+            assert response.status == 200
+            await server.drain()
+            assert received == [(42, '/start')]
+            assert middleware.updates == [10]
+            response = await client.get('/health')
+            assert response.status == 503
+            response = await client.post('/webhook', json=UPDATE, headers={SECRET_HEADER: SECRET})
+            assert response.status == 503
+        await (await bot.get_session()).close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.dispatcher.handler import CancelHandler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+from config import (THROTTLE_USER_RATE, THROTTLE_USER_BURST, THROTTLE_CHAT_RATE, THROTTLE_CHAT_BURST,
+                    THROTTLE_IDLE_TIMEOUT, SEND_GLOBAL_RATE, SEND_CHAT_RATE, SEND_CHAT_BURST)
+
+logger = logging.getLogger(__name__)
+
+# методы Bot API, которые отправляют или изменяют сообщения в чате
+SEND_METHODS_PREFIXES = ('send', 'edit', 'copy', 'forward')
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не более capacity,
+    warned - владелец предупрежден о превышении лимита"""
+    __slots__ = ('tokens', 'stamp', 'warned')
+
+    def __init__(self, capacity, now) -> None:
+        self.tokens = capacity
+        self.stamp = now
+        self.warned = False
+
+    def refill(self, rate, capacity, now):
+        self.tokens = min(capacity, self.tokens + (now - self.stamp) * rate)
+        self.stamp = now
+
+
+class TokenBuckets:
+    """Набор token bucket по ключам (пользователь, чат) с удалением
+    корзин, к которым не обращались idle_timeout секунд
+    """
+
+    def __init__(self, rate, capacity, idle_timeout=THROTTLE_IDLE_TIMEOUT) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.idle_timeout = idle_timeout
+        self.buckets = {}
+        self.__last_sweep = time.monotonic()
+
+    def __bucket(self, key, now):
+        if now - self.__last_sweep > self.idle_timeout:
+            self.evict_idle(now)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.capacity, now)
+        else:
+            bucket.refill(self.rate, self.capacity, now)
+        return bucket
+
+    def consume(self, key):
+        """Функция для списания токена
+        Returns:
+            bool: True если токен списан, False если лимит исчерпан
+        """
+        bucket = self.__bucket(key, time.monotonic())
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return True
+        return False
+
+    def delay(self, key):
+        """Функция для расчета времени до появления токена в секундах"""
+        bucket = self.__bucket(key, time.monotonic())
+        return max(0.0, (1 - bucket.tokens) / self.rate)
+
+    async def acquire(self, key):
+        """Функция для ожидания и списания токена"""
+        while not self.consume(key):
+            await asyncio.sleep(self.delay(key))
+
+    def evict_idle(self, now=None):
+        """Функция для удаления неактивных корзин"""
+        now = time.monotonic() if now is None else now
+        self.__last_sweep = now
+        idle = [key for key, bucket in self.buckets.items() if now - bucket.stamp > self.idle_timeout]
+        for key in idle:
+            del self.buckets[key]
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Middleware для ограничения частоты входящих сообщений и нажатий
+    по пользователю и чату. Сообщения сверх лимита отбрасываются,
+    о превышении лимита пользователь предупреждается один раз, отметка
+    о предупреждении хранится в корзине пользователя и удаляется вместе с ней.
+    """
+
+    def __init__(self, user_rate=THROTTLE_USER_RATE, user_burst=THROTTLE_USER_BURST,
+                 chat_rate=THROTTLE_CHAT_RATE, chat_burst=THROTTLE_CHAT_BURST) -> None:
+        super().__init__()
+        self.users = TokenBuckets(user_rate, user_burst)
+        self.chats = TokenBuckets(chat_rate, chat_burst)
+
+    async def throttle(self, user_id, chat_id, notify):
+        allowed = self.users.consume(user_id) and self.chats.consume(chat_id)
+        # корзина пользователя создана при списании токена
+        bucket = self.users.buckets[user_id]
+        if allowed:
+            bucket.warned = False
+            return
+        logger.debug('Превышен лимит запросов пользователем %s в чате %s', user_id, chat_id)
+        if not bucket.warned:
+            bucket.warned = True
+            await notify()
+        raise CancelHandler()
+
+    async def on_pre_process_message(self, message, data):
+        await self.throttle(message.from_user.id, message.chat.id,
+                            lambda: message.answer('Слишком много запросов, подождите несколько секунд'))
+
+    async def on_pre_process_callback_query(self, callback_query, data):
+        chat_id = callback_query.message.chat.id if callback_query.message else callback_query.from_user.id
+        await self.throttle(callback_query.from_user.id, chat_id,
+                            lambda: callback_query.answer('Слишком много запросов, подождите несколько секунд'))
+
+
+class ThrottledBot(Bot):
+    """Bot с общим ограничением скорости отправки сообщений
+    (не более SEND_GLOBAL_RATE в секунду и SEND_CHAT_RATE в секунду в один чат).
+    Запросы сверх лимита ожидают своей очереди, а не отбрасываются.
+    """
+
+    def __init__(self, *args, global_rate=SEND_GLOBAL_RATE, chat_rate=SEND_CHAT_RATE,
+                 chat_burst=SEND_CHAT_BURST, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # емкость не меньше одного токена, иначе при доле лимита меньше 1 в секунду отправка невозможна
+        self.global_limit = TokenBuckets(global_rate, max(1.0, global_rate))
+        self.chat_limit = TokenBuckets(chat_rate, chat_burst)
+
+    async def request(self, method, data=None, files=None, **kwargs):
+        if method.startswith(SEND_METHODS_PREFIXES):
+            chat_id = (data or {}).get('chat_id')
+            if chat_id is not None:
+                await self.chat_limit.acquire(chat_id)
+            await self.global_limit.acquire(None)
+        return await super().request(method, data, files, **kwargs)
@@ -1,129 +1,445 @@
+import asyncio
+import hashlib
 import httpx
+import json
 import logging
+import sys
+import time
+from collections import defaultdict, namedtuple
 from http import HTTPStatus
-from exceptions import UnexpectedAnswer
-from config import HEADERS
+from exceptions import LoadCancelled, ServerError, UnexpectedAnswer
+from config import (HEADERS, API_HTTP2, API_MAX_CONNECTIONS,
+                    API_MAX_KEEPALIVE_CONNECTIONS, API_KEEPALIVE_EXPIRY, API_LOG_BODY_LIMIT,
+                    API_TIMEOUT, API_TIMEOUTS, API_RETRIES)
+from resilience import CircuitBreaker, backoff_delay
 
 from aiogram import types
 
 logger = logging.getLogger(__name__)
 
+ApiAnswer = namedtuple('ApiAnswer', ['status_code', 'data'])
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+CatalogValidator = namedtuple('CatalogValidator', ['etag', 'last_modified', 'digest', 'data'])
 
-def create_keyboard(key_list):
+
+def truncate(value, limit=API_LOG_BODY_LIMIT):
+    """Функция для обрезки больших значений в отладочных логах
+        Args:
+            value: значение для логирования
+            limit (int): максимальная длина строки
+        Return:
+            str: строковое представление не длиннее limit символов
+    """
+    text = str(value)
+    if len(text) <= limit:
+        return text
+    return f'{text[:limit]}... (еще {len(text) - limit} символов)'
+
+
+def create_keyboard(key_list, row_width=1, back=False):
     """Функция для создания клавиатуры
         Args:
             key_list (list): список кнопок
+            row_width (int): количество кнопок в ряду
+            back (bool): добавить кнопку Назад отдельным рядом
         Return:
             ReplyKeyboardMarkup: обьект клавиатуры с набором кнопок
     """
-    keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True, selective=True)
-    for key in key_list:
-        keyboard.add(key)
+    keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True, selective=True, row_width=row_width)
+    keyboard.add(*key_list)
+    if back:
+        keyboard.row('Назад')
     return keyboard
 
 
+class InflightRequests:
+    """Объединение одновременных одинаковых запросов: пока запрос по ключу
+    выполняется, остальные вызовы ожидают его результат, а не отправляют свой.
+    Результат не сохраняется после завершения запроса. Если выполняющий запрос
+    вызов отменен, загрузку повторяет один из ожидающих.
+    hits - сэкономленные запросы к API, misses - отправленные запросы
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.__futures = {}
+
+    async def run(self, key, loader):
+        """Функция для выполнения loader или ожидания уже выполняющегося запроса с тем же ключом
+        Args:
+            key: ключ запроса, например url
+            loader (callable): корутинная функция без аргументов
+        Returns:
+            результат loader, общий для всех ожидающих, изменять его нельзя
+        """
+        while True:
+            future = self.__futures.get(key)
+            if future is None:
+                break
+            self.hits += 1
+            try:
+                return await asyncio.shield(future)
+            except LoadCancelled:
+                # загрузка отменена вместе с вызвавшим ее обработчиком, загружаем сами
+                self.hits -= 1
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.__futures[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.set_exception(LoadCancelled(f'Загрузка {key} отменена'))
+            future.exception()
+            raise
+        except Exception as error:
+            future.set_exception(error)
+            # помечаем исключение полученным, если других ожидающих нет
+            future.exception()
+            raise
+        finally:
+            del self.__futures[key]
+        future.set_result(value)
+        return value
+
+    def stats(self):
+        """Функция для получения статистики объединения запросов
+        Returns:
+            dict: hits, misses, size - запросов в процессе, ratio - доля сэкономленных запросов
+        """
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.__futures),
+                'ratio': self.hits / total if total else 0.0}
+
+
+class CatalogValidators:
+    """Валидаторы ответов каталога для условных GET запросов: по url хранятся
+    ETag, Last-Modified, хэш тела и разобранный ответ prepare_data.
+    На ответ 304 и на ответ с тем же телом возвращается сохраненный результат без разбора.
+    hits - ответы без разбора (not_modified - 304, unchanged - тело не изменилось),
+    misses - разобранные ответы
+    """
+
+    def __init__(self) -> None:
+        self.not_modified = 0
+        self.unchanged = 0
+        self.misses = 0
+        self.__validators = {}
+
+    def headers(self, url):
+        """Функция для формирования заголовков условного запроса
+        Returns:
+            dict: If-None-Match и If-Modified-Since, если для url есть валидаторы
+        """
+        validator = self.__validators.get(url)
+        headers = {}
+        if validator is not None:
+            if validator.etag:
+                headers['If-None-Match'] = validator.etag
+            if validator.last_modified:
+                headers['If-Modified-Since'] = validator.last_modified
+        return headers
+
+    def resolve(self, url, response, parse):
+        """Функция для получения результата по ответу API
+        Args:
+            url (str): адрес запроса
+            response (httpx.Response): ответ 200 или 304
+            parse (callable): функция разбора тела, разобранного из json
+        Returns:
+            результат parse, общий для всех запросов url до изменения тела, изменять его нельзя
+        Raises:
+            UnexpectedAnswer: ответ 304 на запрос без валидаторов
+        """
+        validator = self.__validators.get(url)
+        if response.status_code == HTTPStatus.NOT_MODIFIED:
+            if validator is None:
+                raise UnexpectedAnswer('Ответ 304 на запрос без валидаторов')
+            self.not_modified += 1
+            return validator.data
+        digest = hashlib.blake2b(response.content, digest_size=16).digest()
+        if validator is not None and validator.digest == digest:
+            self.unchanged += 1
+            data = validator.data
+        else:
+            self.misses += 1
+            try:
+                body = json.loads(response.content) if response.content else None
+            except ValueError:
+                body = None
+            data = parse(body)
+        self.__validators[url] = CatalogValidator(response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                                                  digest, data)
+        return data
+
+    def stats(self):
+        """Функция для получения статистики условных запросов
+        Returns:
+            dict: hits, misses, size - url с валидаторами, ratio - доля ответов без разбора,
+            not_modified, unchanged
+        """
+        hits = self.not_modified + self.unchanged
+        total = hits + self.misses
+        return {'hits': hits, 'misses': self.misses, 'size': len(self.__validators),
+                'ratio': hits / total if total else 0.0, 'not_modified': self.not_modified,
+                'unchanged': self.unchanged}
+
+
 class WorkerApi:
-    def __init__(self, url) -> None:
+    """Асинхронный клиент API CampBotControl.
+    Использует один долгоживущий httpx.AsyncClient с keep-alive и HTTP/2,
+    клиент открывается методом open и закрывается методом close
+    (вызываются в хуках startup/shutdown executor).
+    Таймауты задаются для каждого endpoint, при недоступности API
+    запросы отклоняются выключателем breaker без ожидания.
+    """
+
+    def __init__(self, url, http2=API_HTTP2, limits=None, timeout=API_TIMEOUT, timeouts=API_TIMEOUTS,
+                 retries=API_RETRIES, breaker=None) -> None:
         self.__url = url
+        self.timeout = timeout
+        self.timeouts = timeouts
+        self.retries = retries
+        self.breaker = CircuitBreaker() if breaker is None else breaker
+        self.__http2 = http2
+        self.__limits = limits or httpx.Limits(
+            max_connections=API_MAX_CONNECTIONS,
+            max_keepalive_connections=API_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=API_KEEPALIVE_EXPIRY,
+        )
+        self.__client = None
+        self.__timings = defaultdict(lambda: [0, 0.0, 0.0])
+        # функции hook(method, endpoint, status, elapsed), вызываются после каждого запроса,
+        # status равен None, если ответ не получен
+        self.hooks = []
+        self.inflight = InflightRequests()
+        self.validators = CatalogValidators()
 
-    @staticmethod
-    def __get_api_answer(url, *args, **kwargs):
+    async def open(self):
+        """Функция для открытия пула соединений с API"""
+        if self.__client is None:
+            logger.debug('Открываем пул соединений к API')
+            self.__client = httpx.AsyncClient(headers=HEADERS, http2=self.__http2, limits=self.__limits)
+
+    async def close(self):
+        """Функция для закрытия пула соединений с API"""
+        if self.__client is not None:
+            logger.debug('Закрываем пул соединений к API')
+            await self.__client.aclose()
+            self.__client = None
+
+    @property
+    def client(self):
+        """Открытый httpx.AsyncClient
+        Raises:
+            RuntimeError: клиент не открыт
+        """
+        if self.__client is None:
+            raise RuntimeError('Клиент API не открыт, необходимо вызвать open()')
+        return self.__client
+
+    def __endpoint(self, url):
+        """Функция для получения имени endpoint по url для статистики"""
+        return url[len(self.__url):].split('/', 1)[0] or '/'
+
+    def timing_stats(self):
+        """Функция для получения статистики времени ответа API по endpoint
+        Returns:
+            dict: (метод, endpoint): {count, total, max}
+        """
+        return {key: dict(zip(('count', 'total', 'max'), values)) for key, values in self.__timings.items()}
+
+    async def __request(self, method, url, endpoint, **kwargs):
+        """Функция для одной попытки запроса с учетом времени ответа и состояния выключателя
+        Args:
+            method (str): http метод
+            url (str): адрес куда отправляем запрос
+            endpoint (str): имя endpoint для статистики и таймаута
+            kwargs: именованные аргументы запроса httpx (params, data)
+        Return:
+            httpx.Response: ответ API
+        Raises:
+            BackendUnavailable: выключатель разомкнут
+            httpx.HTTPError: ошибка соединения или таймаут
+        """
+        self.breaker.before_request()
+        status = None
+        start = time.perf_counter()
+        try:
+            answer = await self.client.request(method, url, timeout=self.timeouts.get(endpoint, self.timeout),
+                                               **kwargs)
+            status = answer.status_code
+        except httpx.HTTPError:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release_trial()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            timing = self.__timings[(method, endpoint)]
+            timing[0] += 1
+            timing[1] += elapsed
+            timing[2] = max(timing[2], elapsed)
+            for hook in self.hooks:
+                hook(method, endpoint, status, elapsed)
+        if status >= HTTPStatus.INTERNAL_SERVER_ERROR:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return answer
+
+    async def __send(self, method, url, parse=True, **kwargs):
+        """Функция для отправки запроса url и однократного разбора тела ответа.
+        Идемпотентные запросы повторяются при ошибках соединения и ответах 5xx
+        с экспоненциальной паузой
+        Args:
+            method (str): http метод
+            url (str): адрес куда отправляем запрос
+            parse (bool): разобрать тело из json, иначе вернуть ответ httpx без разбора
+            kwargs: именованные аргументы запроса httpx (params, data)
+        Return:
+            ApiAnswer: статус ответа и тело, разобранное из json (None, если тело не json),
+            либо httpx.Response, если parse=False
+        Raises:
+            BackendUnavailable: выключатель разомкнут
+            httpx.HTTPError: проброс ошибок API
+        """
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug('Запрос к API %s %s %s', method, url, truncate(kwargs))
+        endpoint = self.__endpoint(url)
+        retries = self.retries if method in IDEMPOTENT_METHODS else 0
+        for attempt in range(retries + 1):
+            try:
+                answer = await self.__request(method, url, endpoint, **kwargs)
+            except httpx.HTTPError as error:
+                if attempt == retries:
+                    raise httpx.HTTPError(error) from error
+                logger.warning('Ошибка запроса %s %s: %s, повтор %s', method, url, error, attempt + 1)
+            else:
+                if answer.status_code < HTTPStatus.INTERNAL_SERVER_ERROR or attempt == retries:
+                    break
+                logger.warning('API вернул %s на %s %s, повтор %s', answer.status_code, method, url, attempt + 1)
+            await asyncio.sleep(backoff_delay(attempt))
+        if not parse:
+            if debug:
+                logger.debug('API вернул ответ %s: %s', answer.status_code, truncate(answer.text))
+            return ApiAnswer(answer.status_code, answer)
+        try:
+            data = answer.json() if answer.content else None
+        except ValueError:
+            data = None
+        if debug:
+            logger.debug('API вернул ответ %s: %s', answer.status_code, truncate(answer.text if data is None else data))
+        return ApiAnswer(answer.status_code, data)
+
+    async def __get_api_answer(self, url, *args, **kwargs):
         """Функция для отправки get запроса url
         Args:
             url (str): адрес куда отправляем запрос
             args: список аргументов
             kwargs: список именованных аргументов для отправки передачи параметров в запрос
         Return:
-            answer(httpx.Response): ответ API
+            answer(ApiAnswer): ответ API
         Raises:
             httpx.HTTPError: проброс ошибок API
         """
-        try:
-            logger.debug(f"поступил запрос на получение данных \nurl: {url}\nargs: {args}\nkwargs: {kwargs}")
-            answer = httpx.get(url, params=kwargs, headers=HEADERS)
-            logger.debug(f"API вернул ответ: {answer.status_code}\n текст:{answer.json()}")
-            return answer
-        except httpx.HTTPError as error:
-            raise httpx.HTTPError(error) from error
+        return await self.__send('GET', url, params=kwargs)
 
-    @staticmethod
-    def __post_api_answer(url, *args, **kwargs):
+    async def __post_api_answer(self, url, *args, **kwargs):
         """Функция для отправки post запроса url
         Args:
             url (str): адрес куда отправляем запрос
             args: список аргументов
-            kwargs: список именованных аргументов (data) для отправки передачи данных в запрос
+            kwargs: список именованных аргументов (data или json, headers) для отправки передачи данных в запрос
         Return:
-            answer(httpx.Response): ответ API
+            answer(ApiAnswer): ответ API
         Raises:
             httpx.HTTPError: проброс ошибок API
         """
-        try:
-            logger.debug(f"поступил запрос на отправку данных \nurl: {url}\nargs: {args}\nkwargs: {kwargs}")
-            answer = httpx.post(url, data=kwargs.get('data'), headers=HEADERS)
-            logger.debug(f"API вернул ответ: {answer.status_code}\n текст:{answer.json()}")
-            return answer
-        except httpx.HTTPError as error:
-            raise httpx.HTTPError(error) from error
+        return await self.__send('POST', url, data=kwargs.get('data'), json=kwargs.get('json'),
+                                 headers=kwargs.get('headers'))
 
-    @staticmethod
-    def __patch_api_answer(url, *args, **kwargs):
+    async def __patch_api_answer(self, url, *args, **kwargs):
         """Функция для отправки patch запроса url
         Args:
             url (str): адрес куда отправляем запрос
             args: список аргументов
-            kwargs: список именованных аргументов (data_update) для отправки передачи данных в запрос
+            kwargs: список именованных аргументов (data_update, headers) для отправки передачи данных в запрос
         Return:
-            answer(httpx.Response): ответ API
+            answer(ApiAnswer): ответ API
         Raises:
             httpx.HTTPError: проброс ошибок API
         """
-        try:
-            logger.debug(f"поступил запрос на частичное обновление данных \nurl: {url}\nargs: {args}\nkwargs: {kwargs}")
-            answer = httpx.patch(url, data=kwargs.get('data_update'), headers=HEADERS)
-            logger.debug(f"API вернул ответ: {answer.status_code}\n текст:{answer.json()}")
-            return answer
-        except httpx.HTTPError as error:
-            raise httpx.HTTPError(error) from error
-
-    def create_user(self, user_data):
+        return await self.__send('PATCH', url, data=kwargs.get('data_update'), headers=kwargs.get('headers'))
+
+    async def __get_catalog_items(self, url):
+        """Функция для получения списка каталога с объединением одновременных одинаковых запросов.
+        Запрос условный: при ответе 304 или неизменном теле возвращается ранее разобранный список
+        Args:
+            url (str): адрес списка каталога
+        Returns:
+            prepare_data (dict): словарь в формате имя:id, общий для всех ожидающих
+        Raises:
+            ServerError: когда API ответил 5xx после повторов
+            UnexpectedAnswer: когда ответ не 200 и не 304
+        """
+        async def load():
+            response = await self.__send('GET', url, parse=False, headers=self.validators.headers(url))
+            if response.status_code in (HTTPStatus.OK, HTTPStatus.NOT_MODIFIED):
+                return self.validators.resolve(url, response.data, self.prepare_data)
+            if response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
+                raise ServerError(f'API вернул ошибку {response.status_code}')
+            raise UnexpectedAnswer(f'Неожиданный ответ {response.status_code}')
+
+        return await self.inflight.run(url, load)
+
+    @staticmethod
+    def idempotency_headers(idempotency_key):
+        """Функция для формирования заголовка, по которому API распознает повтор запроса"""
+        return {IDEMPOTENCY_HEADER: idempotency_key} if idempotency_key else None
+
+    async def create_user(self, user_data, idempotency_key=None):
         """Функция для формирования url и
         отправки запроса на регистрацию
         Args:
             user_data (dict): пользовательская информация с ключами
             (user_id, fist_name, last_name, age, gender, city)
             для регистрация пользователя в базе данных
+            idempotency_key (str): ключ идемпотентности для повторов запроса
         Returns:
             HTTPStatus.CREATED (int): статус регистрации 201
         Raises:
             httpx.RequestError: ошибка когда статус не равен 201
             """
         url = f'{self.__url}users/'
-        logger.debug(f'Поступил запрос создания пользователя'
-                     f'\nСформирован URL: {url}\n'
-                     f'Поступили следующие данные: {user_data}')
-        response = self.__post_api_answer(url, data=user_data)
+        logger.debug('Поступил запрос создания пользователя\nСформирован URL: %s\n'
+                     'Поступили следующие данные: %s', url, user_data)
+        response = await self.__post_api_answer(url, data=user_data,
+                                                headers=self.idempotency_headers(idempotency_key))
         if not response.status_code == HTTPStatus.CREATED:
             raise httpx.RequestError
         return HTTPStatus.CREATED
 
-    def information_update(self, data_update):
+    async def information_update(self, data_update, idempotency_key=None):
         """Функция для формирования url и
         отправки запроса на обновление информации о пользователе
         Args:
             data_update (dict): информация для обновления с ключами
             (user_id, department)
+            idempotency_key (str): ключ идемпотентности для повторов запроса
         Returns:
             bool: в случае успеха True иначе False
         Raises:
             UnexpectedAnswer: кастомный exception с неопределенным статусом
             """
-        logger.debug(f"Поступил запрос на обновление "
-                     f"информации о пользователе {data_update.get('user_id')}")
         url = f"{self.__url}users/{data_update.pop('user_id')}/"
-        logger.debug(f'\nСформирован URL: {url}\n'
-                     f'Поступили следующие данные: {data_update}')
-        response = self.__patch_api_answer(url, data_update=data_update)
+        logger.debug('Поступил запрос на обновление информации о пользователе\nСформирован URL: %s\n'
+                     'Поступили следующие данные: %s', url, data_update)
+        response = await self.__patch_api_answer(url, data_update=data_update,
+                                                 headers=self.idempotency_headers(idempotency_key))
         if response.status_code == HTTPStatus.OK:
             return True
         elif response.status_code == HTTPStatus.NOT_FOUND:
@@ -131,6 +447,23 @@ class WorkerApi:
         else:
             raise UnexpectedAnswer(f'Неожиданный ответ API {response.status_code}')
 
+    async def bulk_information_update(self, updates):
+        """Функция для формирования url и
+        отправки одного запроса на обновление информации о нескольких пользователях
+        Args:
+            updates (list): список словарей с ключами (user_id, department, is_active)
+        Returns:
+            dict: user_id:bool, True если пользователь обновлен, False если не найден
+        Raises:
+            UnexpectedAnswer: кастомный exception с неопределенным статусом
+            """
+        url = f'{self.__url}users/bulk_update/'
+        logger.debug('Поступил запрос на обновление %s пользователей\nСформирован URL: %s', len(updates), url)
+        response = await self.__post_api_answer(url, json=updates)
+        if response.status_code != HTTPStatus.OK or not isinstance(response.data, list):
+            raise UnexpectedAnswer(f'Неожиданный ответ API {response.status_code}')
+        return {str(item['user_id']): item.get('status') == HTTPStatus.OK for item in response.data}
+
     @staticmethod
     def prepare_data(response):
         """Функция для проверки существования ключей в ответе
@@ -155,10 +488,10 @@ class WorkerApi:
             if resp.get('name') is None:
                 raise KeyError('В ответе API нет ключа name')
             pid, values = resp.values()
-            prepare_data[values] = pid
+            prepare_data[sys.intern(values)] = pid
         return prepare_data
 
-    def get_client_data(self, user_id):
+    async def get_client_data(self, user_id):
         """Функция для формирования url и
         отправки запроса на получения пользователя
         Args:
@@ -167,20 +500,41 @@ class WorkerApi:
             response (dict): обьект словаря с ключом is_exist
             """
         url = f'{self.__url}users/{user_id}/'
-        logger.debug(f'Поступил запрос на получение'
-                     f'информации о пользователе {user_id}'
-                     f'\nСформирован URL: {url}\n'
-                     )
-        response = self.__get_api_answer(url)
+        logger.debug('Поступил запрос на получение информации о пользователе %s\nСформирован URL: %s',
+                     user_id, url)
+        response = await self.__get_api_answer(url)
         if response.status_code not in [HTTPStatus.OK, HTTPStatus.NOT_FOUND]:
             raise UnexpectedAnswer('Неожиданный ответ')
         status = response.status_code == HTTPStatus.OK
-        response = response.json()
+        response = dict(response.data or {})
         response['is_exist'] = status
         return response
 
+    async def get_active_users(self, page=1, page_size=100):
+        """Функция для формирования url и
+        отправки запроса на получение страницы активных пользователей
+        Args:
+            page (int): номер страницы
+            page_size (int): количество пользователей на странице
+        Returns:
+            tuple: список user_id и признак наличия следующей страницы
+        Raises:
+            UnexpectedAnswer: когда ответ != 200
+            """
+        url = f'{self.__url}users/'
+        logger.debug('Поступил запрос на получение страницы %s активных пользователей\nСформирован URL: %s',
+                     page, url)
+        response = await self.__get_api_answer(url, is_active='true', page=page, page_size=page_size)
+        if response.status_code == HTTPStatus.NOT_FOUND and page > 1:
+            return [], False
+        if response.status_code != HTTPStatus.OK:
+            raise UnexpectedAnswer(f'Неожиданный ответ {response.status_code}')
+        if isinstance(response.data, list):
+            # API без пагинации возвращает всех пользователей сразу
+            return [item['user_id'] for item in response.data], False
+        return [item['user_id'] for item in response.data['results']], bool(response.data.get('next'))
 
-    def get_type_education(self):
+    async def get_type_education(self):
         """Функция для формирования url и
         отправки запроса на получение типов образования
         Returns:
@@ -189,16 +543,10 @@ class WorkerApi:
             UnexpectedAnswer: когда ответ != 200
             """
         url = f"{self.__url}type/"
-        logger.debug(f'Поступил запрос на получение'
-                     f'информации о списке образования'
-                     f'\nСформирован URL: {url}\n'
-                     )
-        response = self.__get_api_answer(url)
-        if response.status_code == HTTPStatus.OK:
-            return self.prepare_data(response.json())
-        raise UnexpectedAnswer(f'Неожиданный ответ {response.status_code}')
+        logger.debug('Поступил запрос на получение информации о списке образования\nСформирован URL: %s', url)
+        return await self.__get_catalog_items(url)
 
-    def get_faculties(self, type_pid):
+    async def get_faculties(self, type_pid):
         """Функция для формирования url и
         отправки запроса на получение факультетов по типу образования
         Args:
@@ -209,17 +557,11 @@ class WorkerApi:
             UnexpectedAnswer: когда ответ != 200
             """
         url = f"{self.__url}faculties/{type_pid}/"
-        logger.debug(f'Поступил запрос на получение'
-                     f'информации о списке факультетов'
-                     f'по типу образования с id: {type_pid}'
-                     f'\nСформирован URL: {url}\n'
-                     )
-        response = self.__get_api_answer(url)
-        if response.status_code == HTTPStatus.OK:
-            return self.prepare_data(response.json())
-        raise UnexpectedAnswer(f'Неожиданный ответ {response.status_code}')
+        logger.debug('Поступил запрос на получение информации о списке факультетов '
+                     'по типу образования с id: %s\nСформирован URL: %s', type_pid, url)
+        return await self.__get_catalog_items(url)
 
-    def get_profiles(self, type_pid, faculite_pid):
+    async def get_profiles(self, type_pid, faculite_pid):
         """Функция для формирования url и
         отправки запроса на получение профилей по типу образования и факультету
         Args:
@@ -231,18 +573,12 @@ class WorkerApi:
             UnexpectedAnswer: когда ответ != 200
             """
         url = f"{self.__url}profiles/{type_pid}/{faculite_pid}/"
-        logger.debug(f'Поступил запрос на получение'
-                     f'информации о списке профилей'
-                     f'по типу образования c id: {type_pid}'
-                     f'факультета с id: {faculite_pid}'
-                     f'\nСформирован URL: {url}\n'
-                     )
-        response = self.__get_api_answer(url)
-        if response.status_code == HTTPStatus.OK:
-            return self.prepare_data(response.json())
-        raise UnexpectedAnswer(f'Неожиданный ответ {response.status_code}')
+        logger.debug('Поступил запрос на получение информации о списке профилей '
+                     'по типу образования c id: %s факультета с id: %s\nСформирован URL: %s',
+                     type_pid, faculite_pid, url)
+        return await self.__get_catalog_items(url)
 
-    def get_description(self, type_pid, faculite_pid, profile_pid):
+    async def get_description(self, type_pid, faculite_pid, profile_pid):
         """Функция для формирования url и
         отправки запроса на получение описания профилей по типу образования и факультету
         Args:
@@ -255,14 +591,7 @@ class WorkerApi:
             UnexpectedAnswer: когда ответ != 200
             """
         url = f"{self.__url}descriptions/{type_pid}/{faculite_pid}/{profile_pid}/"
-        logger.debug(f'Поступил запрос на получение'
-                     f'информации о профилей'
-                     f'по типу образования c id: {type_pid}'
-                     f'факультета с id: {faculite_pid}'
-                     f'профиля с id: {profile_pid}'
-                     f'\nСформирован URL: {url}\n'
-                     )
-        response = self.__get_api_answer(url)
-        if response.status_code == HTTPStatus.OK:
-            return list(self.prepare_data(response.json()))[0]
-        raise UnexpectedAnswer(f'Неожиданный ответ {response.status_code}')
+        logger.debug('Поступил запрос на получение информации о профиле '
+                     'по типу образования c id: %s факультета с id: %s профиля с id: %s\nСформирован URL: %s',
+                     type_pid, faculite_pid, profile_pid, url)
+        return list(await self.__get_catalog_items(url))[0]
@@ -0,0 +1,109 @@
+import asyncio
+import hmac
+import logging
+
+from aiogram import Bot, Dispatcher, types
+from aiohttp import web
+
+from config import (WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBAPP_HOST,
+                    WEBAPP_PORT, WEBHOOK_DRAIN_TIMEOUT)
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class WebhookServer:
+    """aiohttp сервер для получения обновлений Telegram через webhook.
+    POST path - прием обновления, ответ отправляется сразу, обновление
+    обрабатывается в фоне. GET /health - проверка состояния.
+    При остановке новые обновления не принимаются, обработка начатых
+    ожидается не дольше drain_timeout секунд.
+    Для локальной проверки достаточно отправить POST с json обновления,
+    если WEBHOOK_URL не задан, webhook в Telegram не регистрируется.
+    """
+
+    def __init__(self, dispatcher, path=WEBHOOK_PATH, secret=WEBHOOK_SECRET, url=WEBHOOK_URL,
+                 drain_timeout=WEBHOOK_DRAIN_TIMEOUT) -> None:
+        self.dispatcher = dispatcher
+        self.path = path
+        self.secret = secret
+        self.url = url
+        self.drain_timeout = drain_timeout
+        self.accepting = True
+        self.__tasks = set()
+        self.app = web.Application()
+        self.app.router.add_post(path, self.handle_update)
+        self.app.router.add_get('/health', self.handle_health)
+
+    @property
+    def in_flight(self):
+        return len(self.__tasks)
+
+    async def handle_update(self, request):
+        """Функция для приема обновления Telegram"""
+        if self.secret and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ''), self.secret):
+            logger.warning('Получено обновление с неверным секретным токеном от %s', request.remote)
+            return web.Response(status=403)
+        if not self.accepting:
+            return web.Response(status=503)
+        try:
+            update = types.Update(**await request.json())
+        except (ValueError, TypeError) as error:
+            logger.warning('Не удалось разобрать обновление: %s', error)
+            return web.Response(status=400)
+        task = asyncio.create_task(self.process_update(update))
+        self.__tasks.add(task)
+        task.add_done_callback(self.__tasks.discard)
+        return web.Response()
+
+    async def process_update(self, update):
+        """Функция для обработки обновления диспетчером"""
+        Bot.set_current(self.dispatcher.bot)
+        Dispatcher.set_current(self.dispatcher)
+        try:
+            await self.dispatcher.updates_handler.notify(update)
+        except Exception as error:
+            logger.exception(error)
+
+    async def handle_health(self, request):
+        """Функция для проверки состояния сервера"""
+        status = 200 if self.accepting else 503
+        return web.json_response({'status': 'ok' if self.accepting else 'stopping', 'in_flight': self.in_flight},
+                                 status=status)
+
+    async def drain(self):
+        """Функция для остановки приема обновлений и ожидания обработки начатых"""
+        self.accepting = False
+        if self.__tasks:
+            logger.info('Ожидаем обработку %s обновлений', len(self.__tasks))
+            await asyncio.wait(set(self.__tasks), timeout=self.drain_timeout)
+
+    def run(self, host=WEBAPP_HOST, port=WEBAPP_PORT, on_startup=None, on_shutdown=None):
+        """Функция для запуска сервера
+        Args:
+            host (str): адрес сервера
+            port (int): порт сервера
+            on_startup (callable): корутина, вызываемая с диспетчером при запуске
+            on_shutdown (callable): корутина, вызываемая с диспетчером при остановке
+        """
+        async def startup(app):
+            Bot.set_current(self.dispatcher.bot)
+            Dispatcher.set_current(self.dispatcher)
+            if on_startup is not None:
+                await on_startup(self.dispatcher)
+            if self.url:
+                await self.dispatcher.bot.set_webhook(f'{self.url}{self.path}', secret_token=self.secret or None)
+
+        async def shutdown(app):
+            await self.drain()
+            if on_shutdown is not None:
+                await on_shutdown(self.dispatcher)
+            await self.dispatcher.storage.close()
+            await self.dispatcher.storage.wait_closed()
+            session = await self.dispatcher.bot.get_session()
+            await session.close()
+
+        self.app.on_startup.append(startup)
+        self.app.on_shutdown.append(shutdown)
+        web.run_app(self.app, host=host, port=port)